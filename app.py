@@ -1,56 +1,120 @@
 from flask import Flask, render_template, request, redirect, url_for, jsonify, Response, send_file, session, flash
-from datetime import datetime, timedelta
+from jinja2.utils import htmlsafe_json_dumps
+from datetime import datetime, timedelta, time as dt_time
 import json
-import time
-import random
 import logging
-from collections import deque
+import os
 from io import BytesIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from functools import wraps
 import atexit
-from reportlab.lib.units import inch
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from cache import LRUCache
+from events import ChangeBus, ChangeRelay
+from exporter import EXPORT_COLUMNS, EXPORT_MIMETYPES, export_chunks
+from forecasting import FORECAST_WINDOW_DAYS, forecast_products
+from importer import import_items, iter_rows
+from jobs import JobLimitError, ReportJobs
+from locks import KeyedLocks
+from prediction import OnlineSalesPrediction
+from reports import build_sales_report, build_summary_report
+from sse_server import SSEServer
+from storage import SQLiteRepository, JournalRepository
+from store import DATE_FORMAT, format_order_date, parse_order_date, serialize_order
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # Replace with a strong secret key
 
+# Serve /stream from the asyncio SSE server on this port when set
+app.config['SSE_PORT'] = int(os.environ['SSE_PORT']) if os.environ.get('SSE_PORT') else None
+app.config['SSE_HOST'] = os.environ.get('SSE_HOST', '0.0.0.0')
+app.config['SSE_URL'] = os.environ.get('SSE_URL')  # Public URL of the SSE server, if proxied
+# Comma-separated origins of pages allowed to open the stream; by default the app's own host on any port
+app.config['SSE_ALLOWED_ORIGINS'] = [origin.strip() for origin in os.environ.get('SSE_ALLOWED_ORIGINS', '').split(',')
+                                     if origin.strip()]
+app.config['DATABASE_PATH'] = os.environ.get('DATABASE_PATH', os.path.join(app.root_path, 'inventory.db'))
+# 'sqlite', or 'journal' for an append-only journal with periodic snapshots in JOURNAL_DIR
+app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'sqlite')
+app.config['JOURNAL_DIR'] = os.environ.get('JOURNAL_DIR', os.path.join(app.root_path, 'journal'))
+app.config['SNAPSHOT_INTERVAL'] = int(os.environ.get('SNAPSHOT_INTERVAL', 300))
+# Set when several worker processes share the SQLite database (gunicorn --workers > 1)
+app.config['SHARED_STATE'] = os.environ.get('SHARED_STATE', '').lower() in ('1', 'true', 'yes')
+app.config['CHANGE_POLL_INTERVAL'] = float(os.environ.get('CHANGE_POLL_INTERVAL', 0.5))
+# Report jobs keep their status and PDFs here; workers sharing state must share the directory
+app.config['REPORT_DIR'] = os.environ.get('REPORT_DIR', os.path.join(app.root_path, 'report_jobs'))
+app.config['REPORT_WORKERS'] = int(os.environ.get('REPORT_WORKERS', 2))
+app.config['REPORT_JOBS_PER_USER'] = int(os.environ.get('REPORT_JOBS_PER_USER', 2))
+app.config['REPORT_CACHE_BYTES'] = int(os.environ.get('REPORT_CACHE_BYTES', 64 * 1024 * 1024))
+app.config['FORECAST_CACHE_MODELS'] = int(os.environ.get('FORECAST_CACHE_MODELS', 1000))
+app.config['FRAGMENT_CACHE_CHARS'] = int(os.environ.get('FRAGMENT_CACHE_CHARS', 16 * 1024 * 1024))
+app.config['FORECAST_WORKERS'] = int(os.environ.get('FORECAST_WORKERS', os.cpu_count() or 1))
+
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
 
 # Global variables
-users = {}  # This will store all user data
+if app.config['STORAGE_BACKEND'] == 'journal':
+    if app.config['SHARED_STATE']:
+        raise RuntimeError("The journal backend is single-process; use STORAGE_BACKEND=sqlite with SHARED_STATE")
+    repo = JournalRepository(app.config['JOURNAL_DIR'], app.config['SNAPSHOT_INTERVAL'])
+else:
+    repo = SQLiteRepository(app.config['DATABASE_PATH'], shared=app.config['SHARED_STATE'])  # Durable storage for all user data
+users = repo.users  # In-memory read model of the users loaded so far
+changes = ChangeBus()  # Per-user change notifications for /stream
+tenant_locks = KeyedLocks()  # Serialises each user's stock-changing requests
+
+LOW_STOCK_THRESHOLD = 10
+STREAM_HEARTBEAT = 30  # Seconds between keep-alive comments on idle streams
+MAX_BATCH_ORDERS = 1000  # Orders accepted by one /add_orders request
+PAGE_SIZE = 50  # Rows per page on /orders, /inventory and /history
+MAX_PAGE_SIZE = 200
+HISTORY_ACTIONS = ('Order Created', 'Item Added/Updated', 'Inventory Imported', 'Item Updated', 'Item Deleted')
+CURSOR_DATE_FORMAT = "%Y%m%d%H%M%S"
+BOOT_ID = uuid.uuid4().hex[:8]  # Tells apart in-process version counters of successive runs
+report_jobs = ReportJobs(app.config['REPORT_DIR'], workers=app.config['REPORT_WORKERS'],
+                         per_user=app.config['REPORT_JOBS_PER_USER'])  # Renders PDFs off the request thread
+report_cache = LRUCache(app.config['REPORT_CACHE_BYTES'])  # Rendered PDFs by user, parameters and data version
+REPORT_PARAMS = ('view', 'type', 'date', 'start_date', 'end_date')
+forecast_models = LRUCache(app.config['FORECAST_CACHE_MODELS'], size=lambda model: 1)  # Fitted sales forecasts by user and data version
+fragment_cache = LRUCache(app.config['FRAGMENT_CACHE_CHARS'])  # Rendered page fragments by user and data version
+# Splits large catalogs' per-product forecasts; NumPy releases the GIL while solving
+forecast_executor = (ThreadPoolExecutor(app.config['FORECAST_WORKERS'], thread_name_prefix='forecast')
+                     if app.config['FORECAST_WORKERS'] > 1 else None)
 
 def init_user_data(email, username, password):
     """Initialize a new user with empty data structures"""
-    users[email] = {
-        'username': username,
-        'password': password,  # Make sure password is stored
-        'inventory': [],
-        'inventory_name': 'Inventory System',
-        'company_name': 'Inventory Dashboard',
-        'orders': [],
-        'history': [],
-        'categories': [],
-        'stocks': []
-    }
-    return users[email]
+    return repo.create_user(email, username, password)
 
 def init_user_if_needed(email):
-    if email not in users:
-        users[email] = {
-            'username': session['username'],
-            'inventory': [],
-            'inventory_name': 'Inventory System',
-            'company_name': 'Inventory Dashboard',
-            'orders': [],
-            'history': [],
-            'categories': [],
-            'stocks': []
-        }
-    return users[email]
+    return repo.get_user(email) or repo.create_user(email, session['username'], None)
+
+def data_version(email):
+    """Version of a user's data that changes whenever the data does"""
+    if app.config['SHARED_STATE']:
+        repo.get_user(email)  # Catch up with other workers' commits first
+        return repo.version(email)  # The same in every worker
+    return changes.version(email)
+
+def data_etag(email, *parts):
+    """ETag for a response computed from a user's data at its current version"""
+    # Shared versions live in the database and survive restarts; in-process ones start over
+    scope = 'db' if app.config['SHARED_STATE'] else BOOT_ID
+    return '-'.join(str(part) for part in (scope, data_version(email)) + parts)
+
+@app.before_request
+def begin_request():
+    """Give write requests the current data of other workers before they read it"""
+    if app.config['SHARED_STATE'] and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        repo.begin_write()
+
+@app.teardown_request
+def commit_request(exc):
+    """Commit everything the request wrote as one transaction"""
+    if exc is None:
+        repo.commit()
+    else:
+        repo.rollback()
 
 # Login required decorator
 def login_required(f):
@@ -61,190 +125,125 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Per-user write lock decorator, applied below login_required
+def tenant_locked(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        # Check-then-update of stock levels must not interleave for one user
+        with tenant_locks(session['user_email']):
+            return f(*args, **kwargs)
+    return decorated_function
+
+# Conditional GET decorator for JSON reads, applied below login_required
+def versioned_json(per_day=False):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Read the version before computing, so a change meanwhile is never masked
+            parts = (datetime.now().strftime('%Y%m%d'),) if per_day else ()
+            etag = data_etag(session['user_email'], *parts)
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = app.make_response(f(*args, **kwargs))
+                # A body built while the data changed may not match either version
+                if response.status_code != 200 or data_etag(session['user_email'], *parts) != etag:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return decorated_function
+    return decorator
+
 # Helper functions - make sure these are the ONLY definitions of these functions
 def get_low_stock_products(user_email):
     """Get low stock products for specific user"""
     user_data = users[user_email]
-    return [item for item in user_data['inventory'] if item.get('quantity', 0) < 10]
+    return [item for item in user_data['inventory'] if item.get('quantity', 0) < LOW_STOCK_THRESHOLD]
 
 def get_category_data(user_email):
     """Get category data for specific user"""
     user_data = users[user_email]
-    categories = {}
-    category_prices = {}
     
-    for item in user_data['inventory']:
-        category = item.get('category', 'Uncategorized')
-        quantity = item.get('quantity', 0)
-        price = item.get('price', 0) * quantity
-        
-        # Update quantities
-        if category in categories:
-            categories[category] += quantity
-        else:
-            categories[category] = quantity
-            
-        # Update prices
-        if category in category_prices:
-            category_prices[category] += price
-        else:
-            category_prices[category] = price
+    # Categories sorted by total price
+    sorted_categories = user_data['inventory'].valuation.categories.ranked()
     
     # Ensure we have at least some data
-    if not categories:
-        categories['No Data'] = 0
-        category_prices['No Data'] = 0
-        
-    # Sort categories by total price
-    sorted_categories = sorted(category_prices.items(), key=lambda x: x[1], reverse=True)
-    labels = [item[0] for item in sorted_categories]
-    price_data = [item[1] for item in sorted_categories]
-    quantity_data = [categories[label] for label in labels]
+    if not sorted_categories:
+        sorted_categories = [('No Data', 0, 0)]
     
     return {
-        'labels': labels,
-        'price_data': price_data,
-        'quantity_data': quantity_data
+        'labels': [item[0] for item in sorted_categories],
+        'price_data': [item[2] for item in sorted_categories],
+        'quantity_data': [item[1] for item in sorted_categories]
     }
 
 def get_sales_data(user_email):
     """Get sales data for charts"""
     user_data = users[user_email]
-    orders = user_data.get('orders', [])
-    
-    # Product-wise sales data
-    product_sales = {}
-    for order in orders:
-        for item in order.get('items', []):
-            name = item.get('name', 'Unknown')
-            quantity = item.get('quantity', 0)
-            price = item.get('price', 0) * quantity
-            
-            if name in product_sales:
-                product_sales[name]['quantity'] += quantity
-                product_sales[name]['revenue'] += price
-            else:
-                product_sales[name] = {'quantity': quantity, 'revenue': price}
+    sales = user_data['sales']
     
-    # Sort products by revenue
-    sorted_products = sorted(product_sales.items(), key=lambda x: x[1]['revenue'], reverse=True)
+    # Top 10 products by revenue
+    top_products = sales.top_products(10)
     
     # Today's sales data (by hour)
-    today = datetime.now().date()
-    hourly_sales = {i: {'revenue': 0, 'quantity': 0} for i in range(24)}  # Initialize all hours
-    
-    for order in orders:
-        order_date = datetime.strptime(order.get('date', ''), "%Y-%m-%d %H:%M:%S").date()
-        if order_date == today:
-            hour = datetime.strptime(order.get('date', ''), "%Y-%m-%d %H:%M:%S").hour
-            hourly_sales[hour]['revenue'] += order.get('total', 0)
-            for item in order.get('items', []):
-                hourly_sales[hour]['quantity'] += item.get('quantity', 0)
+    hourly_sales = sales.hourly_sales(datetime.now().date())
     
     return {
         'product': {
-            'labels': [item[0] for item in sorted_products[:10]],  # Top 10 products
-            'revenue_data': [item[1]['revenue'] for item in sorted_products[:10]],
-            'quantity_data': [item[1]['quantity'] for item in sorted_products[:10]]
+            'labels': [item['name'] for item in top_products],
+            'revenue_data': [item['revenue'] for item in top_products],
+            'quantity_data': [item['quantity'] for item in top_products]
         },
         'today': {
             'labels': [f'{i:02d}:00' for i in range(24)],
-            'data': [hourly_sales[i]['revenue'] for i in range(24)],
-            'quantity_data': [hourly_sales[i]['quantity'] for i in range(24)]
+            'data': [bucket['revenue'] for bucket in hourly_sales],
+            'quantity_data': [bucket['quantity'] for bucket in hourly_sales]
         }
     }
 
 def get_inventory_data(user_email):
     """Get both category and item-wise inventory data"""
     user_data = users[user_email]
+    valuation = user_data['inventory'].valuation
     
-    # Initialize empty dictionaries
-    categories = {}
-    category_prices = {}
-    items = {}
-    item_prices = {}
-    
-    # Process inventory data
-    for item in user_data.get('inventory', []):
-        category = item.get('category', 'Uncategorized')
-        name = item.get('name', 'Unknown')
-        quantity = float(item.get('quantity', 0))
-        price = float(item.get('price', 0)) * quantity
-        
-        # Update category data
-        if category in categories:
-            categories[category] += quantity
-            category_prices[category] += price
-        else:
-            categories[category] = quantity
-            category_prices[category] = price
-            
-        # Update item data
-        if name in items:
-            items[name] += quantity
-            item_prices[name] += price
-        else:
-            items[name] = quantity
-            item_prices[name] = price
+    # Categories and items sorted by total price
+    sorted_categories = valuation.categories.ranked()
+    sorted_items = valuation.items.ranked()
     
     # Ensure we have at least some data
-    if not categories:
-        categories['No Data'] = 0
-        category_prices['No Data'] = 0
-    
-    if not items:
-        items['No Items'] = 0
-        item_prices['No Items'] = 0
+    if not sorted_categories:
+        sorted_categories = [('No Data', 0, 0)]
     
-    # Sort categories by total price
-    sorted_categories = sorted(category_prices.items(), key=lambda x: x[1], reverse=True)
-    category_labels = [item[0] for item in sorted_categories]
-    category_price_data = [item[1] for item in sorted_categories]
-    category_quantity_data = [categories[label] for label in category_labels]
-    
-    # Sort items by total price
-    sorted_items = sorted(item_prices.items(), key=lambda x: x[1], reverse=True)
-    item_labels = [item[0] for item in sorted_items]
-    item_price_data = [item[1] for item in sorted_items]
-    item_quantity_data = [items[label] for label in item_labels]
+    if not sorted_items:
+        sorted_items = [('No Items', 0, 0)]
     
     return {
         'category': {
-            'labels': category_labels,
-            'price_data': category_price_data,
-            'quantity_data': category_quantity_data
+            'labels': [item[0] for item in sorted_categories],
+            'price_data': [item[2] for item in sorted_categories],
+            'quantity_data': [item[1] for item in sorted_categories]
         },
         'item': {
-            'labels': item_labels,
-            'price_data': item_price_data,
-            'quantity_data': item_quantity_data
+            'labels': [item[0] for item in sorted_items],
+            'price_data': [item[2] for item in sorted_items],
+            'quantity_data': [item[1] for item in sorted_items]
         }
     }
 
 def get_forecasting_data(user_email):
     """Get forecasting data for specific user"""
     user_data = users[user_email]
-    forecast = {}
     
-    # Calculate average daily sales for each product
-    for order in user_data['orders']:
-        order_date = datetime.strptime(order['date'], "%Y-%m-%d %H:%M:%S").date()
-        days_ago = (datetime.now().date() - order_date).days
-        if days_ago <= 30:  # Consider last 30 days
-            for item in order['items']:
-                name = item['name']
-                if name not in forecast:
-                    forecast[name] = {
-                        'total_quantity': 0,
-                        'days_with_sales': set()
-                    }
-                forecast[name]['total_quantity'] += item['quantity']
-                forecast[name]['days_with_sales'].add(order_date)
+    # Calculate average daily sales for each product over the last 30 days
+    window_start = datetime.combine(datetime.now().date() - timedelta(days=30), dt_time.min)
+    activity = user_data['sales'].lines.daily_activity(window_start)
     
     # Calculate forecasted stock needs
     forecast_data = {}
-    for name, data in forecast.items():
-        avg_daily_sales = data['total_quantity'] / max(len(data['days_with_sales']), 1)
+    for name, (total_quantity, days_with_sales) in activity.items():
+        avg_daily_sales = total_quantity / max(days_with_sales, 1)
         forecast_data[name] = max(0, avg_daily_sales * 7)  # 7-day forecast
     
     # Sort by forecasted quantity
@@ -264,16 +263,59 @@ def get_forecasting_data(user_email):
         'data': [item[1] for item in sorted_forecast]
     }
 
+def get_sales_prediction(user_email):
+    """Get the user's fitted sales forecast, refitting from running sums when their data changed"""
+    key = (user_email, data_version(user_email))
+    model = forecast_models.get(key)
+    if model is None:
+        model = OnlineSalesPrediction(users[user_email]['sales'].trend)
+        forecast_models.put(key, model)
+    return model
+
+def cached_fragment(user_email, name, render):
+    """Return a page fragment for the user's current data, rendering it only on a cache miss"""
+    key = (user_email, data_version(user_email), name)
+    html = fragment_cache.get(key)
+    if html is None:
+        html = render()
+        fragment_cache.put(key, html)
+    return html
+
+def page_size():
+    """Rows per page requested by the client, within bounds"""
+    return min(max(request.args.get('per_page', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+
+def order_cursor(order):
+    """Encode an order's (date, id) position for a ?before= link"""
+    return f"{order['date'].strftime(CURSOR_DATE_FORMAT)}-{order.get('id') or 0}"
+
+def parse_order_cursor(value):
+    """Decode a ?before= order cursor, or None if absent or malformed"""
+    try:
+        date, order_id = value.split('-')
+        return datetime.strptime(date, CURSOR_DATE_FORMAT), int(order_id)
+    except (AttributeError, ValueError):
+        return None
+
 def format_indian_currency(amount):
     s = f"{amount:.2f}"
     integer_part, decimal_part = s.split(".")
     integer_part = "{:,}".format(int(integer_part)).replace(",", ",")
     return f"₹{integer_part}.{decimal_part}"
 
+@app.template_filter('order_date')
+def order_date_filter(value, fmt=DATE_FORMAT):
+    """Format an order timestamp for display"""
+    return format_order_date(value, fmt)
+
 def cleanup():
-    """Function to clear in-memory data."""
-    global users
+    """Function to clear in-memory data and close the database."""
+    # Close first: the journal backend snapshots the users on close
+    repo.close()
     users.clear()
+    report_jobs.shutdown()
+    if forecast_executor is not None:
+        forecast_executor.shutdown(wait=False)
     print("Cleanup: Cleared all in-memory data.")
 
 # Register the cleanup function to be called on exit
@@ -293,7 +335,7 @@ def login():
         email = request.form['email']
         password = request.form['password']
         
-        user = users.get(email)
+        user = repo.get_user(email)
         
         if user and user.get('password') == password:
             session['user_email'] = email
@@ -312,18 +354,12 @@ def register():
         password = request.form['password']
         username = request.form['username']
         
+        if repo.get_user(email):
+            flash('An account with this email already exists.', 'error')
+            return render_template('register.html')
+        
         # Initialize user data with necessary keys
-        users[email] = {
-            'password': password,
-            'username': username,
-            'inventory': [],
-            'inventory_name': 'Inventory System',
-            'company_name': 'Inventory Dashboard',  # Add default company name
-            'orders': [],
-            'history': [],
-            'categories': [],
-            'stocks': []
-        }
+        init_user_data(email, username, password)
         
         flash('Registration successful! Please log in.', 'success')
         return redirect(url_for('login'))
@@ -349,40 +385,26 @@ def dashboard():
         # Update inventory name
         new_inventory_name = request.form.get('inventory_name')
         if new_inventory_name:
-            user_data['inventory_name'] = new_inventory_name
+            repo.update_settings(user_email, inventory_name=new_inventory_name)
+            changes.publish(user_email)
             flash('Inventory name updated successfully!', 'success')
     
-    # Calculate dashboard metrics
-    inventory_count = len(user_data['inventory'])
-    total_sales = sum(float(order.get('total', 0)) for order in user_data['orders'])
-    low_stock_products = get_low_stock_products(user_email)
-    
-    # Get analytics data for mini charts
-    sales_mini_data = get_sales_mini_data(user_email)
-    inventory_mini_data = get_inventory_mini_data(user_email)
-    product_sales_data = get_product_sales_data(user_email)
-    today_sales_data = get_today_sales_data(user_email)
-    
-    # Sort orders by date in descending order (newest first)
-    sorted_orders = sorted(
-        user_data['orders'],
-        key=lambda x: datetime.strptime(x['date'], "%Y-%m-%d %H:%M:%S"),
-        reverse=True
-    )
-    
     return render_template('dashboard.html', 
-                         inventory_count=inventory_count,
-                         total_sales=total_sales,
                          company_name=user_data['company_name'],  # Use user-specific company name
-                         low_stock_products=low_stock_products,
-                         orders=sorted_orders[:5],  # Get only the 5 most recent orders
-                         sales_mini_data=sales_mini_data,
-                         inventory_mini_data=inventory_mini_data,
-                         product_sales_data=product_sales_data,
-                         today_sales_data=today_sales_data,
+                         summary_html=dashboard_summary(user_email),
                          username=username,
                          inventory_name=user_data['inventory_name'])
 
+def dashboard_summary(user_email):
+    """Metrics, recent orders and low stock, rendered once per data version"""
+    user_data = users[user_email]
+    return cached_fragment(user_email, 'dashboard_summary', lambda: render_template(
+        'fragments/dashboard_summary.html',
+        inventory_count=len(user_data['inventory']),
+        total_sales=user_data['sales'].total_revenue,
+        low_stock_products=get_low_stock_products(user_email),
+        orders=user_data['orders'].newest(5)))
+
 # Orders route (protected)
 @app.route('/orders')
 @login_required
@@ -390,25 +412,34 @@ def orders_page():
     user_email = session['user_email']
     user_data = init_user_if_needed(user_email)
     
-    # Sort orders by date in descending order (newest first)
-    sorted_orders = sorted(
-        user_data['orders'],
-        key=lambda x: datetime.strptime(x['date'], "%Y-%m-%d %H:%M:%S"),
-        reverse=True
-    )
+    orders = user_data['orders']
+    customer = request.args.get('customer', '').strip()
+    per_page = page_size()
+    
+    match = None
+    if customer:
+        needle = customer.lower()
+        match = lambda order: needle in (order.get('customer') or '').lower()
+    
+    # Fetch one extra row to know whether an older page exists
+    page = orders.page(parse_order_cursor(request.args.get('before')), per_page + 1, match)
+    next_cursor = order_cursor(page[per_page - 1]) if len(page) > per_page else None
     
     return render_template('orders.html', 
-                         orders=sorted_orders,
-                         inventory=user_data['inventory'],
+                         orders=page[:per_page],
+                         customer=customer,
+                         per_page=per_page,
+                         next_cursor=next_cursor,
                          company_name=user_data['company_name'])
 
 # Add order route (protected)
 @app.route('/add_order', methods=['POST'])
 @login_required
+@tenant_locked
 def add_order():
     try:
         user_email = session['user_email']
-        user_data = users[user_email]
+        user_data = init_user_if_needed(user_email)
         
         # Get form data
         customer = request.form.get('customer')
@@ -422,17 +453,17 @@ def add_order():
             }), 400
         
         order_items = []
+        touched_ids = []
         total = 0
         
-        # Process each item in the order
+        # Check stock for the whole order before taking any of it
+        lines = []
+        required = {}
         for item_name, quantity in zip(items, quantities):
             quantity = int(quantity)
             
             # Find the item in inventory
-            inventory_item = next(
-                (item for item in user_data['inventory'] if item['name'] == item_name),
-                None
-            )
+            inventory_item = user_data['inventory'].find_by_name(item_name)
             
             if not inventory_item:
                 return jsonify({
@@ -440,14 +471,19 @@ def add_order():
                     "message": f"Item '{item_name}' not found in inventory"
                 }), 404
             
-            if inventory_item['quantity'] < quantity:
+            required[inventory_item['id']] = required.get(inventory_item['id'], 0) + quantity
+            if inventory_item['quantity'] < required[inventory_item['id']]:
                 return jsonify({
                     "success": False,
                     "message": f"Insufficient stock for '{item_name}'"
                 }), 400
-            
+            lines.append((item_name, quantity, inventory_item))
+        
+        # Process each item in the order
+        for item_name, quantity, inventory_item in lines:
             # Update inventory quantity
-            inventory_item['quantity'] -= quantity
+            repo.adjust_stock(user_email, inventory_item, -quantity)
+            touched_ids.append(inventory_item['id'])
             
             # Add item to order
             item_total = quantity * inventory_item['price']
@@ -458,34 +494,31 @@ def add_order():
             })
             total += item_total
         
-        # Find the highest order ID and increment by 1
-        max_order_id = max((order.get('id', 0) for order in user_data['orders']), default=0)
-        new_order_id = max_order_id + 1
-        
         # Create new order
         order = {
-            'id': new_order_id,
+            'id': user_data['orders'].next_id(),
             'customer': customer,
             'items': order_items,
             'total': total,
-            'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            'date': datetime.now().replace(microsecond=0)
         }
         
-        # Add order to user's orders
-        user_data['orders'].append(order)
+        # Add order to user's orders and sales totals
+        repo.add_order(user_email, order)
         
         # Add to history
-        user_data['history'].append({
+        repo.add_history(user_email, {
             'action': 'Order Created',
             'order_id': order['id'],
             'customer': customer,
-            'date': order['date']
+            'date': format_order_date(order['date'])
         })
+        changes.publish(user_email, item_ids=touched_ids)
         
         return jsonify({
             "success": True,
             "message": "Order added successfully",
-            "order": order
+            "order": serialize_order(order)
         })
         
     except Exception as e:
@@ -495,6 +528,122 @@ def add_order():
             "message": str(e)
         }), 500
 
+def validate_order_batch(user_data, batch):
+    """Check a batch of JSON orders against current stock, returning (orders, stock deltas, errors)"""
+    orders, errors = [], []
+    required = {}
+    now = datetime.now().replace(microsecond=0)
+    
+    for index, data in enumerate(batch):
+        if not isinstance(data, dict) or not data.get('customer') or not data.get('items'):
+            errors.append({'index': index, 'message': "Invalid input data"})
+            continue
+        
+        try:
+            order_date = parse_order_date(data['date']) if data.get('date') else now
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'message': f"Invalid date, expected {DATE_FORMAT}"})
+            continue
+        
+        order_items = []
+        total = 0
+        for line in data['items']:
+            name = line.get('name') if isinstance(line, dict) else None
+            try:
+                quantity = int(line.get('quantity', 0)) if name else 0
+            except (TypeError, ValueError):
+                quantity = 0
+            if quantity <= 0:
+                errors.append({'index': index, 'message': f"Invalid quantity for '{name}'"})
+                break
+            
+            inventory_item = user_data['inventory'].find_by_name(name)
+            if not inventory_item:
+                errors.append({'index': index, 'message': f"Item '{name}' not found in inventory"})
+                break
+            
+            # Stock is checked against everything earlier in the batch too
+            required[inventory_item['id']] = required.get(inventory_item['id'], 0) + quantity
+            if inventory_item['quantity'] < required[inventory_item['id']]:
+                errors.append({'index': index, 'message': f"Insufficient stock for '{name}'"})
+                break
+            
+            order_items.append({
+                'name': name,
+                'quantity': quantity,
+                'price': inventory_item['price']
+            })
+            total += quantity * inventory_item['price']
+        else:
+            orders.append({
+                'customer': data['customer'],
+                'items': order_items,
+                'total': total,
+                'date': order_date
+            })
+    
+    return orders, required, errors
+
+# Batch order route: applies every order or none
+@app.route('/add_orders', methods=['POST'])
+@login_required
+@tenant_locked
+def add_orders():
+    try:
+        user_email = session['user_email']
+        user_data = init_user_if_needed(user_email)
+        
+        batch = (request.get_json(silent=True) or {}).get('orders')
+        if not isinstance(batch, list) or not batch:
+            return jsonify({
+                "success": False,
+                "message": "Expected a JSON body with a non-empty 'orders' list"
+            }), 400
+        if len(batch) > MAX_BATCH_ORDERS:
+            return jsonify({
+                "success": False,
+                "message": f"At most {MAX_BATCH_ORDERS} orders per batch"
+            }), 413
+        
+        orders, required, errors = validate_order_batch(user_data, batch)
+        if errors:
+            return jsonify({
+                "success": False,
+                "message": f"{len(errors)} of {len(batch)} orders are invalid; none were added",
+                "errors": errors
+            }), 400
+        
+        # Take the stock once per item for the whole batch
+        for item_id, quantity in required.items():
+            repo.adjust_stock(user_email, user_data['inventory'].get(item_id), -quantity)
+        
+        # Allocate a contiguous block of ids
+        first_id = user_data['orders'].next_id()
+        for offset, order in enumerate(orders):
+            order['id'] = first_id + offset
+        repo.add_orders(user_email, orders)
+        
+        repo.add_history_entries(user_email, [{
+            'action': 'Order Created',
+            'order_id': order['id'],
+            'customer': order['customer'],
+            'date': format_order_date(order['date'])
+        } for order in orders])
+        changes.publish(user_email, item_ids=required)
+        
+        return jsonify({
+            "success": True,
+            "message": f"{len(orders)} orders added successfully",
+            "orders": [serialize_order(order) for order in orders]
+        })
+        
+    except Exception as e:
+        print(f"Error adding orders: {e}")
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 500
+
 # Protect all other routes
 @app.before_request
 def require_login():
@@ -509,14 +658,51 @@ def require_login():
 def inventory_page():
     user_email = session['user_email']
     user_data = init_user_if_needed(user_email)
+    category = request.args.get('category', '').strip()
+    search = request.args.get('q', '').strip()
+    after = request.args.get('after', type=int)
+    per_page = page_size()
+    
+    match = None
+    if category or search:
+        needle = search.lower()
+        match = lambda item: ((not category or item.get('category') == category)
+                              and needle in item['name'].lower())
+    
+    # Fetch one extra row to know whether a further page exists
+    page = user_data['inventory'].page(after, per_page + 1, match)
+    next_after = page[per_page - 1]['id'] if len(page) > per_page else None
+    
     return render_template('inventory.html', 
-                         inventory=user_data['inventory'], 
+                         inventory=page[:per_page], 
                          categories=user_data['categories'],
+                         category=category,
+                         search=search,
+                         per_page=per_page,
+                         next_after=next_after,
                          company_name=user_data['company_name'])
 
+# Item picker route: the order and item forms load matching items from here as the user types
+@app.route('/search_items')
+@login_required
+@versioned_json()
+def search_items():
+    user_email = session['user_email']
+    user_data = init_user_if_needed(user_email)
+    needle = request.args.get('q', '').strip().lower()
+    match = (lambda item: needle in item['name'].lower()) if needle else None
+    
+    items = user_data['inventory'].page(None, page_size(), match)
+    return jsonify({
+        "success": True,
+        "items": [{'id': item['id'], 'name': item['name'], 'price': item['price'], 'quantity': item['quantity']}
+                  for item in items]
+    })
+
 # Add item route
 @app.route('/add_item', methods=['POST'])
 @login_required
+@tenant_locked
 def add_item():
     try:
         user_email = session['user_email']
@@ -535,22 +721,17 @@ def add_item():
         price = float(request.form.get('price', 0))
         
         # Check if item already exists
-        existing_item = next(
-            (item for item in user_data['inventory'] if 
-             item['name'].lower() == name.lower() and 
-             item['category'].lower() == category.lower() and
-             item['price'] == price),
-            None
-        )
+        existing_item = user_data['inventory'].find_matching(name, category, price)
         
         if existing_item:
             # Update existing item quantity
-            existing_item['quantity'] += quantity
+            repo.adjust_stock(user_email, existing_item, quantity)
+            item_id = existing_item['id']
             message = "Item quantity updated successfully"
         else:
             # Create new item
             item = {
-                'id': len(user_data['inventory']) + 1,
+                'id': user_data['inventory'].next_id(),
                 'name': name,
                 'category': category,
                 'quantity': quantity,
@@ -560,11 +741,12 @@ def add_item():
             }
             
             # Add to user's inventory
-            user_data['inventory'].append(item)
+            repo.add_item(user_email, item)
+            item_id = item['id']
             message = "Item added successfully"
         
         # Add to user's history
-        user_data['history'].append({
+        repo.add_history(user_email, {
             'action': 'Item Added/Updated',
             'item': name,
             'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -572,7 +754,9 @@ def add_item():
         
         # Add category if it's new
         if category not in user_data['categories']:
-            user_data['categories'].append(category)
+            repo.add_category(user_email, category)
+        
+        changes.publish(user_email, item_ids=[item_id])
         
         return jsonify({"success": True, "message": message})
     
@@ -580,13 +764,84 @@ def add_item():
         print(f"Error adding item: {e}")
         return jsonify({"success": False, "message": str(e)}), 400
 
+def import_format(filename, content_type):
+    """Pick csv or ndjson from the format parameter, file extension or content type"""
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt.lower()
+    if (filename or '').lower().endswith(('.ndjson', '.jsonl')) or 'ndjson' in (content_type or ''):
+        return 'ndjson'
+    return 'csv'
+
+# Bulk inventory import from an uploaded CSV or NDJSON file (or the raw request body)
+@app.route('/import_inventory', methods=['POST'])
+@login_required
+@tenant_locked
+def import_inventory():
+    try:
+        user_email = session['user_email']
+        init_user_if_needed(user_email)
+        
+        upload = request.files.get('file')
+        if upload:
+            stream, fmt = upload.stream, import_format(upload.filename, upload.mimetype)
+        else:
+            stream, fmt = request.stream, import_format(None, request.mimetype)
+        if fmt not in ('csv', 'ndjson'):
+            return jsonify({"success": False, "message": f"Unsupported format '{fmt}'"}), 400
+        
+        summary = import_items(repo, user_email, iter_rows(stream, fmt))
+        if summary['failed'] and repo.can_rollback:
+            # Discard the chunks already written, so the failed import saves nothing
+            logger.error("Error importing inventory: %s", summary['failed'])
+            repo.rollback()
+            return jsonify({"success": False, "message": f"{summary['failed']}. Nothing was imported."}), 500
+        
+        repo.add_history(user_email, {
+            'action': 'Inventory Imported',
+            'item': f"{summary['added']} added, {summary['updated']} updated",
+            'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+        changes.publish(user_email, item_ids=summary.pop('item_ids'))
+        
+        if summary['failed']:
+            # This backend cannot take back the chunks already written, so report what was saved
+            logger.error("Error importing inventory: %s", summary['failed'])
+            return jsonify(dict(summary, success=False, complete=False,
+                                message=f"{summary['failed']}. Rows up to {summary['saved_row']} were saved "
+                                        f"({summary['added']} added, {summary['updated']} updated); "
+                                        f"the rest of the upload was not imported.")), 500
+        
+        # Rows read before an unreadable part of the upload are kept, so report them as imported
+        message = f"Imported {summary['rows'] - summary['error_count']} of {summary['rows']} rows"
+        if summary['stopped']:
+            message += f"; the rest of the upload was not imported. {summary['stopped']}"
+        return jsonify(dict(summary, success=True, complete=summary['stopped'] is None, message=message))
+    
+    except Exception as e:
+        logger.exception("Error importing inventory")
+        # Discards uncommitted writes where the backend can; the journal keeps them
+        repo.rollback()
+        return jsonify({"success": False, "message": str(e)}), 400
+
 @app.route('/history')
 @login_required
 def history_page():
     user_email = session['user_email']
     user_data = init_user_if_needed(user_email)
+    action = request.args.get('action', '').strip()
+    per_page = page_size()
+    
+    # Fetch one extra row to know whether an older page exists
+    page = user_data['history'].page(request.args.get('before', type=int), per_page + 1, action or None)
+    next_before = page[per_page - 1][0] if len(page) > per_page else None
+    
     return render_template('history.html', 
-                         history=user_data['history'], 
+                         history=[entry for _, entry in page[:per_page]], 
+                         actions=HISTORY_ACTIONS,
+                         action=action,
+                         per_page=per_page,
+                         next_before=next_before,
                          company_name=user_data['company_name'])
 
 @app.route('/settings')
@@ -602,7 +857,8 @@ def settings_page():
 def update_company_name():
     user_email = session['user_email']
     user_data = init_user_if_needed(user_email)
-    user_data['company_name'] = request.form['company_name']
+    repo.update_settings(user_email, company_name=request.form['company_name'])
+    changes.publish(user_email)
     return jsonify({
         "success": True, 
         "message": "Company name updated successfully", 
@@ -615,30 +871,27 @@ def analytics_page():
     user_email = session['user_email']
     user_data = init_user_if_needed(user_email)
     
-    # Get inventory data for charts
-    inventory_data = get_inventory_data(user_email)
-    
-    # Get sales data
-    sales_data = get_sales_data(user_email)
-    
-    # Get top products
-    top_products = get_top_products(user_email)
+    # Chart data and the top products table are built once per data version
+    inventory_json = cached_fragment(user_email, 'inventory_chart',
+                                     lambda: htmlsafe_json_dumps(get_inventory_data(user_email)))
+    # Sales charts include today's hours, so they are cached per day as well
+    sales_json = cached_fragment(user_email, f"sales_chart:{datetime.now().date()}",
+                                 lambda: htmlsafe_json_dumps(get_sales_data(user_email)))
+    top_products_html = cached_fragment(user_email, 'top_products', lambda: render_template(
+        'fragments/top_products.html', top_products=get_top_products(user_email)))
     
     return render_template('analytics.html',
-                         inventory_data=inventory_data,
-                         sales_data=sales_data,
-                         top_products=top_products,
+                         inventory_json=inventory_json,
+                         sales_json=sales_json,
+                         top_products_html=top_products_html,
                          company_name=user_data.get('company_name', 'Inventory Dashboard'))
 
 def get_sales_mini_data(user_email):
     """Get recent sales data for mini chart"""
     user_data = users[user_email]
-    recent_orders = sorted(user_data['orders'], 
-                         key=lambda x: datetime.strptime(x['date'], "%Y-%m-%d %H:%M:%S"),
-                         reverse=True)[:7]
+    recent_orders = user_data['orders'].newest(7)
     data = [order.get('total', 0) for order in recent_orders]
-    labels = [datetime.strptime(order['date'], "%Y-%m-%d %H:%M:%S").strftime("%d/%m")
-             for order in recent_orders]
+    labels = [order['date'].strftime("%d/%m") for order in recent_orders]
     return {
         'labels': labels,
         'data': data
@@ -658,35 +911,18 @@ def get_inventory_mini_data(user_email):
 def get_product_sales_data(user_email):
     """Get product sales data"""
     user_data = users[user_email]
-    product_sales = {}
-    for order in user_data['orders']:
-        for item in order['items']:
-            name = item['name']
-            if name not in product_sales:
-                product_sales[name] = 0
-            product_sales[name] += item['quantity'] * item['price']
     
-    # Sort by sales value and get top 5
-    sorted_sales = sorted(product_sales.items(), key=lambda x: x[1], reverse=True)[:5]
+    # Top 5 products by sales value
+    top_products = user_data['sales'].top_products(5)
     return {
-        'labels': [item[0] for item in sorted_sales],
-        'data': [item[1] for item in sorted_sales]
+        'labels': [item['name'] for item in top_products],
+        'data': [item['revenue'] for item in top_products]
     }
 
 def get_today_sales_data(user_email):
     """Get today's sales data"""
     user_data = users[user_email]
-    today = datetime.now().date()
-    today_sales = {}
-    
-    for order in user_data['orders']:
-        order_date = datetime.strptime(order['date'], "%Y-%m-%d %H:%M:%S").date()
-        if order_date == today:
-            for item in order['items']:
-                name = item['name']
-                if name not in today_sales:
-                    today_sales[name] = 0
-                today_sales[name] += item['quantity'] * item['price']
+    today_sales = user_data['sales'].product_sales_on(datetime.now().date())
     
     return {
         'labels': list(today_sales.keys()),
@@ -696,234 +932,180 @@ def get_today_sales_data(user_email):
 def get_top_products(user_email):
     """Get top selling products"""
     user_data = users[user_email]
-    orders = user_data.get('orders', [])
-    
-    # Aggregate product sales
-    product_sales = {}
-    for order in orders:
-        for item in order.get('items', []):
-            name = item.get('name', 'Unknown')
-            quantity = item.get('quantity', 0)
-            price = item.get('price', 0)
-            revenue = price * quantity
-            
-            if name in product_sales:
-                product_sales[name]['quantity'] += quantity
-                product_sales[name]['revenue'] += revenue
-            else:
-                product_sales[name] = {
-                    'name': name,
-                    'quantity': quantity,
-                    'revenue': revenue
-                }
-    
-    # Convert to list and sort by revenue
-    top_products = list(product_sales.values())
-    top_products.sort(key=lambda x: x['revenue'], reverse=True)
-    
-    return top_products[:5]  # Return top 5 products
+    return user_data['sales'].top_products(5)  # Return top 5 products
+
+def get_stream_counts(user_data):
+    """Get the dashboard counters pushed over /stream"""
+    return {
+        'inventory_count': len(user_data['inventory']),
+        'order_count': len(user_data['orders']),
+        'total_sales': user_data['sales'].total_revenue
+    }
+
+def get_stream_snapshot(user_email):
+    """Get the counters and low stock items (by id) a new stream starts from"""
+    user_data = repo.get_user(user_email)
+    if user_data is None:
+        raise KeyError(user_email)
+    counts = get_stream_counts(user_data)
+    low_stock = {item['id']: dict(item) for item in get_low_stock_products(user_email)}
+    return counts, low_stock
+
+def get_stream_delta(user_email, counts, low_stock, item_ids):
+    """Diff a user's data against what a stream last sent, updating counts and low_stock in place"""
+    user_data = repo.get_user(user_email)
+    data = {'event': 'delta'}
+    
+    for key, value in get_stream_counts(user_data).items():
+        if counts.get(key) != value:
+            counts[key] = value
+            data[key] = value
+    
+    # Only the touched items can have entered or left the low stock list,
+    # unless the stream fell behind and has to rescan the inventory
+    if item_ids is None:
+        item_ids = set(low_stock) | {item['id'] for item in get_low_stock_products(user_email)}
+    
+    added, removed = [], []
+    for item_id in item_ids:
+        item = user_data['inventory'].get(item_id)
+        if item and item.get('quantity', 0) < LOW_STOCK_THRESHOLD:
+            if low_stock.get(item_id) != item:
+                low_stock[item_id] = dict(item)
+                added.append(dict(item))
+        elif item_id in low_stock:
+            del low_stock[item_id]
+            removed.append(item_id)
+    
+    if added:
+        data['low_stock_added'] = added
+    if removed:
+        data['low_stock_removed'] = removed
+    return data if len(data) > 1 else None
 
 @app.route('/stream')
 @login_required
 def stream():
     user_email = session['user_email']
-    user_data = init_user_if_needed(user_email)
+    init_user_if_needed(user_email)
+    
     def event_stream():
+        # Send a full snapshot first, then only what changes
+        version = changes.version(user_email)
+        counts, low_stock = get_stream_snapshot(user_email)
+        yield f"data: {json.dumps(dict(counts, event='update', low_stock_products=list(low_stock.values())))}\n\n"
+        
         while True:
+            new_version, item_ids = changes.wait(user_email, version, timeout=STREAM_HEARTBEAT)
+            if new_version == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = new_version
             try:
-                with app.app_context():
-                    with app.test_request_context():
-                        if 'user_email' in session:
-                            user_email = session['user_email']
-                            user_data = users.get(user_email, {
-                                'inventory': [],
-                                'orders': [],
-                                'stocks': []
-                            })
-                            
-                            data = {
-                                'event': 'update',
-                                'inventory_count': len(user_data['inventory']),
-                                'order_count': len(user_data['orders']),
-                                'total_sales': sum(order.get('total', 0) for order in user_data['orders']),
-                                'low_stock_products': get_low_stock_products(user_email)
-                            }
-                            
-                            yield f"data: {json.dumps(data)}\n\n"
-                time.sleep(5)
+                data = get_stream_delta(user_email, counts, low_stock, item_ids)
             except Exception as e:
                 print(f"Stream error: {e}")
-                time.sleep(5)
+                continue
+            if data:
+                yield f"data: {json.dumps(data)}\n\n"
     
-    return Response(event_stream(), mimetype="text/event-stream")
+    return Response(event_stream(), mimetype="text/event-stream",
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+sse_server = SSEServer(app, changes, snapshot=get_stream_snapshot, delta=get_stream_delta,
+                       allowed_origins=app.config['SSE_ALLOWED_ORIGINS'])
+# Tells this worker's streams about writes made by the other workers; only the shared SQLite backend has any
+change_relay = (ChangeRelay(changes, poll=repo.poll_changes, latest=repo.latest_version,
+                            interval=app.config['CHANGE_POLL_INTERVAL'])
+                if app.config['SHARED_STATE'] else None)
+
+@app.before_request
+def start_sse_server():
+    # Started lazily so the debug reloader's parent process never binds the port
+    if app.config['SSE_PORT']:
+        sse_server.start(app.config['SSE_HOST'], app.config['SSE_PORT'])
+    if change_relay is not None:
+        change_relay.start()
+
+@app.context_processor
+def inject_stream_url():
+    """URL the dashboards open their EventSource on"""
+    if not app.config['SSE_PORT']:
+        return {'stream_url': url_for('stream')}
+    if app.config['SSE_URL']:
+        return {'stream_url': app.config['SSE_URL']}
+    return {'stream_url': f"//{request.host.split(':')[0]}:{app.config['SSE_PORT']}/stream"}
+
+def render_report(key, build, args):
+    """Build a report PDF, or return the cached copy if the data hasn't changed since"""
+    data = report_cache.get(key)
+    if data is None:
+        data = build(*args)
+        report_cache.put(key, data)
+    return data
+
+def report_cache_key(user_email, kind, params):
+    values = tuple(None if params.get(name) is None else str(params.get(name)) for name in REPORT_PARAMS)
+    return (user_email, kind, values, data_version(user_email))
+
+def summary_report_args(user_data):
+    """Snapshot what the summary report shows, so it can be rendered outside the request"""
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    sales = user_data['sales']
+    args = (user_data.get('company_name'), sales.total_revenue, len(user_data['orders']),
+            [dict(product) for product in sales.top_products()], user_data['orders'].newest(10), current_date)
+    return f'sales_report_{current_date}.pdf', args
+
+def sales_report_args(user_data, params):
+    """Select the orders a sales report covers, returning (filename, args) or None for invalid parameters"""
+    view = params.get('view')
+    report_type = params.get('type')
+    date = params.get('date')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+
+    # Get and sort orders based on parameters
+    start = end = None
+    if report_type == 'overall':
+        filename = "overall_sales_report.pdf"
+    elif report_type == 'range' and start_date and end_date:
+        try:
+            start = datetime.combine(datetime.strptime(start_date, '%Y-%m-%d').date(), dt_time.min)
+            end = datetime.combine(datetime.strptime(end_date, '%Y-%m-%d').date() + timedelta(days=1), dt_time.min)
+        except ValueError:
+            return None
+        filename = f"sales_report_{start_date}_to_{end_date}.pdf"
+    elif view == 'today' and date:
+        try:
+            start = datetime.combine(datetime.strptime(date, '%Y-%m-%d').date(), dt_time.min)
+        except ValueError:
+            return None
+        end = start + timedelta(days=1)
+        filename = f"sales_report_{date}.pdf"
+    elif view == 'product':
+        filename = "product_sales_report.pdf"
+    else:
+        return None
+    orders = user_data['orders'].between(start, end)[::-1]
+
+    # Product totals over the same orders, grouped on the columnar line store
+    product_totals = user_data['sales'].lines.product_totals(start, end) if view == 'product' else None
+
+    return filename, (user_data.get('company_name'), orders, view, report_type, date, start_date, end_date,
+                      product_totals)
 
 @app.route('/generate_report')
 @login_required
 def generate_report():
     user_email = session['user_email']
-    user_data = users[user_email]
-    
-    # Create a PDF buffer
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30,
-        alignment=1  # Center alignment
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Heading2'],
-        fontSize=16,
-        spaceAfter=20,
-        textColor=colors.HexColor('#666666')
-    )
-    
-    # Add company name and report title
-    elements.append(Paragraph(user_data.get('company_name', 'Company Name'), title_style))
-    elements.append(Paragraph('Report', subtitle_style))
-    
-    # Add date range
-    current_date = datetime.now().strftime("%Y-%m-%d")
-    date_text = f"Generated on: {current_date}"
-    elements.append(Paragraph(date_text, styles['Normal']))
-    elements.append(Spacer(1, 20))
-    
-    # Sales Summary Table
-    orders = user_data.get('orders', [])
-    total_revenue = sum(order.get('total', 0) for order in orders)
-    total_orders = len(orders)
-    
-    summary_data = [
-        ['Sales Summary', ''],
-        ['Total Revenue', f"₹{total_revenue:,.2f}"],
-        ['Total Orders', str(total_orders)],
-        ['Average Order Value', f"₹{(total_revenue/total_orders if total_orders > 0 else 0):,.2f}"]
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[200, 200])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8f9fa')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#666666')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dee2e6')),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-    ]))
-    elements.append(summary_table)
-    elements.append(Spacer(1, 30))
-    
-    # Product-wise Sales Table
-    product_sales = {}
-    for order in orders:
-        for item in order.get('items', []):
-            name = item.get('name', 'Unknown')
-            quantity = item.get('quantity', 0)
-            price = item.get('price', 0)
-            revenue = price * quantity
-            
-            if name in product_sales:
-                product_sales[name]['quantity'] += quantity
-                product_sales[name]['revenue'] += revenue
-            else:
-                product_sales[name] = {'quantity': quantity, 'revenue': revenue}
-    
-    # Sort products by revenue
-    sorted_products = sorted(product_sales.items(), key=lambda x: x[1]['revenue'], reverse=True)
-    
-    # Product Sales Table
-    elements.append(Paragraph('Product-wise Sales', subtitle_style))
-    
-    product_data = [['Product Name', 'Quantity Sold', 'Revenue']]
-    for product_name, data in sorted_products:
-        product_data.append([
-            product_name,
-            str(data['quantity']),
-            f"₹{data['revenue']:,.2f}"
-        ])
-    
-    product_table = Table(product_data, colWidths=[200, 100, 100])
-    product_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8f9fa')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#666666')),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dee2e6')),
-        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-    ]))
-    elements.append(product_table)
-    elements.append(Spacer(1, 30))
-    
-    # Recent Orders Table
-    elements.append(Paragraph('Recent Orders', subtitle_style))
-    
-    # Sort orders by date
-    sorted_orders = sorted(orders, key=lambda x: datetime.strptime(x.get('date', ''), "%Y-%m-%d %H:%M:%S"), reverse=True)
-    recent_orders = sorted_orders[:10]  # Get last 10 orders
-    
-    # Prepare data for table
-    table_data = [['Order ID', 'Customer', 'Items', 'Total', 'Date']]
-    
-    for i, order in enumerate(recent_orders, 1):
-        # Format items vertically, one per line
-        items_str = "\n".join([f"{item['name']} (x{item['quantity']})" for item in order['items']])
-        
-        table_data.append([
-            f"#{i:04d}",
-            order['customer'],
-            items_str,
-            f"₹{order['total']:,.2f}",
-            order['date']
-        ])
-    
-    # Create table with properly imported inch unit
-    table = Table(table_data, colWidths=[0.7*inch, 1.5*inch, 2.5*inch, 1*inch, 1.3*inch])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('ALIGN', (2, 1), (2, -1), 'LEFT'),  # Left align items column
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),  # Align all content to top
-        ('TOPPADDING', (0, 1), (-1, -1), 12),  # Add padding to cells
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 12),
-    ]))
-    elements.append(table)
-    
-    # Build PDF
-    doc.build(elements)
-    buffer.seek(0)
+    user_data = init_user_if_needed(user_email)
     
+    filename, args = summary_report_args(user_data)
+    # The report shows today's date, so the filename is part of its key
+    key = report_cache_key(user_email, filename, {})
     return send_file(
-        buffer,
-        download_name=f'sales_report_{current_date}.pdf',
+        BytesIO(render_report(key, build_summary_report, args)),
+        download_name=filename,
         as_attachment=True,
         mimetype='application/pdf'
     )
@@ -957,32 +1139,20 @@ def delete_product(id):
     inventory = [item for item in inventory if item['id'] != id]
     return jsonify({"success": True, "message": "Product deleted successfully"})
 
-@app.route('/get_order/<order_index>')
+@app.route('/get_order/<int:order_id>')
 @login_required
-def get_order(order_index):
+@versioned_json()
+def get_order(order_id):
     try:
         user_email = session['user_email']
-        user_data = users[user_email]
-        
-        # Sort orders by date first
-        sorted_orders = sorted(
-            user_data['orders'],
-            key=lambda x: datetime.strptime(x['date'], "%Y-%m-%d %H:%M:%S"),
-            reverse=True
-        )
+        user_data = init_user_if_needed(user_email)
         
-        index = int(order_index)
-        if 0 <= index < len(sorted_orders):
-            order = sorted_orders[index].copy()  # Create a copy to modify
+        order = user_data['orders'].get(order_id)
+        if order:
+            order = order.copy()  # Create a copy to modify
             
-            try:
-                # Convert the stored date string to datetime object
-                order_datetime = datetime.strptime(order['date'], "%Y-%m-%d %H:%M:%S")
-                # Format for datetime-local input
-                order['date'] = order_datetime.strftime("%Y-%m-%dT%H:%M")
-            except ValueError:
-                # If there's an error parsing the date, use current time
-                order['date'] = datetime.now().strftime("%Y-%m-%dT%H:%M")
+            # Format for datetime-local input
+            order['date'] = order['date'].strftime("%Y-%m-%dT%H:%M")
             
             return jsonify({
                 'success': True,
@@ -993,35 +1163,16 @@ def get_order(order_index):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/edit_order/<order_index>', methods=['POST'])
+@app.route('/edit_order/<int:order_id>', methods=['POST'])
 @login_required
-def edit_order(order_index):
+@tenant_locked
+def edit_order(order_id):
     try:
         user_email = session['user_email']
-        user_data = users[user_email]
-        
-        # Sort orders by date first
-        sorted_orders = sorted(
-            user_data['orders'],
-            key=lambda x: datetime.strptime(x['date'], "%Y-%m-%d %H:%M:%S"),
-            reverse=True
-        )
+        user_data = init_user_if_needed(user_email)
         
-        index = int(order_index)
-        if 0 <= index < len(sorted_orders):
-            # Find the original order in the unsorted list
-            old_order = sorted_orders[index]
-            original_index = user_data['orders'].index(old_order)
-            
-            # Return old items to inventory
-            for item in old_order.get('items', []):
-                item_name = item.get('name')
-                item_quantity = item.get('quantity', 0)
-                for inv_item in user_data['inventory']:
-                    if inv_item['name'] == item_name:
-                        inv_item['quantity'] += item_quantity
-                        break
-            
+        old_order = user_data['orders'].get(order_id)
+        if old_order:
             # Get new order data
             customer = request.form.get('customer')
             order_date = request.form.get('order_date')
@@ -1030,32 +1181,48 @@ def edit_order(order_index):
             if not customer or not items or not order_date:
                 return jsonify({'success': False, 'error': 'Missing required fields'})
             
-            # Convert date string to datetime and format
+            # Convert date string to datetime
             try:
                 order_datetime = datetime.strptime(order_date, '%Y-%m-%dT%H:%M')
-                formatted_date = order_datetime.strftime("%Y-%m-%d %H:%M:%S")
             except ValueError as e:
                 return jsonify({'success': False, 'error': f'Invalid date format: {str(e)}'})
             
-            total = 0
-            new_items = []
+            # Stock available to the new order includes what the old one returns
+            available = {}
+            for item in old_order.get('items', []):
+                inv_item = user_data['inventory'].find_by_name(item.get('name'))
+                if inv_item:
+                    available[inv_item['id']] = available.get(inv_item['id'], 0) + item.get('quantity', 0)
+            
+            lines = []
             for item in items:
                 quantity = int(item['quantity'])
-                price = float(item['price'])
-                item_total = quantity * price
-                
-                inventory_item = next(
-                    (inv_item for inv_item in user_data['inventory'] if inv_item['name'] == item['name']),
-                    None
-                )
+                inventory_item = user_data['inventory'].find_by_name(item['name'])
                 
                 if not inventory_item:
                     return jsonify({'success': False, 'error': f'Item not found: {item["name"]}'})
                 
-                if inventory_item['quantity'] < quantity:
+                available[inventory_item['id']] = available.get(inventory_item['id'], 0) - quantity
+                if inventory_item['quantity'] + available[inventory_item['id']] < 0:
                     return jsonify({'success': False, 'error': f'Insufficient quantity for {item["name"]}'})
+                lines.append((item, quantity, inventory_item))
+            
+            # Return old items to inventory
+            touched_ids = []
+            for item in old_order.get('items', []):
+                inv_item = user_data['inventory'].find_by_name(item.get('name'))
+                if inv_item:
+                    repo.adjust_stock(user_email, inv_item, item.get('quantity', 0))
+                    touched_ids.append(inv_item['id'])
+            
+            total = 0
+            new_items = []
+            for item, quantity, inventory_item in lines:
+                price = float(item['price'])
+                item_total = quantity * price
                 
-                inventory_item['quantity'] -= quantity
+                repo.adjust_stock(user_email, inventory_item, -quantity)
+                touched_ids.append(inventory_item['id'])
                 total += item_total
                 
                 new_items.append({
@@ -1064,13 +1231,16 @@ def edit_order(order_index):
                     'price': price
                 })
             
-            # Update order at its original position
-            user_data['orders'][original_index] = {
+            # Replace the order, re-sorting it by its new date
+            new_order = {
+                'id': old_order['id'],
                 'customer': customer,
                 'items': new_items,
                 'total': total,
-                'date': formatted_date
+                'date': order_datetime
             }
+            repo.replace_order(user_email, old_order, new_order)
+            changes.publish(user_email, item_ids=touched_ids)
             
             return jsonify({'success': True})
         else:
@@ -1081,39 +1251,45 @@ def edit_order(order_index):
 
 @app.route('/get_item/<int:id>')
 @login_required
+@versioned_json()
 def get_item(id):
     user_email = session['user_email']
-    user_data = users[user_email]
+    user_data = init_user_if_needed(user_email)
     
-    item = next((item for item in user_data['inventory'] if item['id'] == id), None)
+    item = user_data['inventory'].get(id)
     if item:
         return jsonify(item)
     return jsonify({"error": "Item not found"}), 404
 
 @app.route('/edit_item', methods=['POST'])
 @login_required
+@tenant_locked
 def edit_item():
     try:
         user_email = session['user_email']
         user_data = init_user_if_needed(user_email)
         
         item_id = int(request.form['id'])
-        item = next((item for item in user_data['inventory'] if item['id'] == item_id), None)
-        if not item:
+        if not user_data['inventory'].get(item_id):
             return jsonify({"success": False, "message": "Item not found"}), 404
         
-        item['name'] = request.form['name']
-        item['category'] = request.form['category']
-        item['quantity'] = int(request.form['quantity'])
-        item['price'] = float(request.form['price'])
-        item['expiry_date'] = request.form['expiry_date'] if request.form['expiry_date'] else None
+        item = repo.update_item(
+            user_email,
+            item_id,
+            name=request.form['name'],
+            category=request.form['category'],
+            quantity=int(request.form['quantity']),
+            price=float(request.form['price']),
+            expiry_date=request.form['expiry_date'] if request.form['expiry_date'] else None
+        )
         
         # Add to user's history
-        user_data['history'].append({
+        repo.add_history(user_email, {
             'action': 'Item Updated',
             'item': item['name'],
             'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         })
+        changes.publish(user_email, item_ids=[item_id])
         
         return jsonify({"success": True, "message": "Item updated successfully"})
     except Exception as e:
@@ -1121,20 +1297,21 @@ def edit_item():
 
 @app.route('/delete_item/<int:id>', methods=['POST'])
 @login_required
+@tenant_locked
 def delete_item(id):
     user_email = session['user_email']
-    user_data = init_user_if_needed(user_email)
+    init_user_if_needed(user_email)
     
-    item = next((item for item in user_data['inventory'] if item['id'] == id), None)
+    item = repo.delete_item(user_email, id)
     if item:
-        user_data['inventory'] = [i for i in user_data['inventory'] if i['id'] != id]
         
         # Add to user's history
-        user_data['history'].append({
+        repo.add_history(user_email, {
             'action': 'Item Deleted',
             'item': item['name'],
             'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         })
+        changes.publish(user_email, item_ids=[id])
         
         return jsonify({"success": True, "message": "Item deleted successfully"})
     return jsonify({"success": False, "message": "Item not found"}), 404
@@ -1151,245 +1328,216 @@ def stocks():
             'symbol': request.form['symbol'],
             'quantity': int(request.form['quantity'])
         }
-        users[user_email]['stocks'].append(stock)
-    
-    # Get user-specific data
-    inventory_count = len(user_data['inventory'])
-    total_sales = sum(order['total'] for order in user_data['orders'])
-    low_stock_products = get_low_stock_products(user_email)
+        repo.add_stock(user_email, stock)
+        changes.publish(user_email)
     
     return render_template('dashboard.html', 
-                         inventory_count=inventory_count,
-                         total_sales=total_sales,
                          company_name=user_data['company_name'],
-                         low_stock_products=low_stock_products,
-                         orders=user_data['orders'],
-                         username=username)
+                         summary_html=dashboard_summary(user_email),
+                         username=username,
+                         inventory_name=user_data['inventory_name'])
 
-@app.route('/delete_order/<order_index>', methods=['POST'])
+@app.route('/delete_order/<int:order_id>', methods=['POST'])
 @login_required
-def delete_order(order_index):
+@tenant_locked
+def delete_order(order_id):
     try:
         user_email = session['user_email']
-        user_data = users[user_email]
-        
-        # Convert order_index to integer
-        index = int(order_index)
+        user_data = init_user_if_needed(user_email)
         
-        # Check if order exists
-        if 0 <= index < len(user_data.get('orders', [])):
-            # Get the order to be deleted
-            order = user_data['orders'][index]
-            
+        order = user_data['orders'].get(order_id)
+        if order:
             # Return items to inventory
+            touched_ids = []
             for item in order.get('items', []):
                 item_name = item.get('name')
                 item_quantity = item.get('quantity', 0)
                 
                 # Find matching inventory item
-                for inv_item in user_data.get('inventory', []):
-                    if inv_item['name'] == item_name:
-                        inv_item['quantity'] += item_quantity
-                        break
+                inv_item = user_data['inventory'].find_by_name(item_name)
+                if inv_item:
+                    repo.adjust_stock(user_email, inv_item, item_quantity)
+                    touched_ids.append(inv_item['id'])
             
-            # Remove the order
-            user_data['orders'].pop(index)
+            # Remove the order and its sales totals
+            repo.delete_order(user_email, order)
+            changes.publish(user_email, item_ids=touched_ids)
             return jsonify({'success': True})
         else:
             return jsonify({'success': False, 'error': 'Order not found'})
             
-    except ValueError:
-        return jsonify({'success': False, 'error': 'Invalid order index'})
     except Exception as e:
         print(f"Error deleting order: {str(e)}")  # Add logging
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/get_daily_sales/<date>')
 @login_required
+@versioned_json()
 def get_daily_sales(date):
     try:
         user_email = session['user_email']
-        user_data = users[user_email]
-        orders = user_data.get('orders', [])
-        
+        user_data = init_user_if_needed(user_email)
         # Convert date string to datetime
         selected_date = datetime.strptime(date, '%Y-%m-%d').date()
         
-        # Initialize hourly sales
-        hourly_sales = {i: 0 for i in range(24)}
-        
-        # Calculate sales for selected date
-        for order in orders:
-            order_datetime = datetime.strptime(order.get('date', ''), "%Y-%m-%d %H:%M:%S")
-            if order_datetime.date() == selected_date:
-                hour = order_datetime.hour
-                hourly_sales[hour] += order.get('total', 0)
+        # Hourly sales for selected date
+        hourly_sales = user_data['sales'].hourly_sales(selected_date)
         
         return jsonify({
             'success': True,
             'sales': {
                 'labels': [f'{i:02d}:00' for i in range(24)],
-                'data': list(hourly_sales.values())
+                'data': [bucket['revenue'] for bucket in hourly_sales]
             }
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/sales_forecast')
+@login_required
+@versioned_json(per_day=True)
+def sales_forecast():
+    user_email = session['user_email']
+    init_user_if_needed(user_email)
+    days = request.args.get('days', 30, type=int)
+    if not 1 <= days <= 365:
+        return jsonify({'success': False, 'message': 'Days must be between 1 and 365'}), 400
+    
+    prediction_data = get_sales_prediction(user_email).get_prediction_data(days)
+    return jsonify({'success': prediction_data['error'] is None, 'forecast': prediction_data})
+
+@app.route('/product_forecast')
+@login_required
+@versioned_json(per_day=True)
+def product_forecast():
+    user_email = session['user_email']
+    user_data = init_user_if_needed(user_email)
+    horizon = request.args.get('days', 30, type=int)
+    window = request.args.get('window', FORECAST_WINDOW_DAYS, type=int)
+    limit = request.args.get('limit', type=int)
+    if not 1 <= horizon <= 365 or not 7 <= window <= 730:
+        return jsonify({'success': False, 'message': 'Days must be 1-365 and window 7-730'}), 400
+    
+    forecasts = forecast_products(user_data, horizon, window, forecast_executor)
+    return jsonify({
+        'success': True,
+        'days': horizon,
+        'window': window,
+        'products': len(forecasts),
+        'forecasts': forecasts[:limit] if limit else forecasts
+    })
+
+@app.route('/cache_stats')
+@login_required
+def cache_stats():
+    return jsonify({
+        'success': True,
+        'fragments': fragment_cache.stats(),
+        'reports': report_cache.stats(),
+        'forecasts': forecast_models.stats()
+    })
+
 @app.route('/download_sales_report')
 @login_required
 def download_sales_report():
     user_email = session['user_email']
     user_data = init_user_if_needed(user_email)
     
-    view = request.args.get('view')
-    report_type = request.args.get('type')
-    date = request.args.get('date')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-
-    # Get and sort orders based on parameters
-    if report_type == 'overall':
-        orders = sorted(user_data['orders'], key=lambda x: x['date'], reverse=True)
-        filename = "overall_sales_report.pdf"
-    elif report_type == 'range' and start_date and end_date:
-        orders = [order for order in user_data['orders'] 
-                 if start_date <= order['date'].split()[0] <= end_date]
-        orders.sort(key=lambda x: x['date'], reverse=True)
-        filename = f"sales_report_{start_date}_to_{end_date}.pdf"
-    elif view == 'today' and date:
-        orders = [order for order in user_data['orders'] 
-                 if order['date'].startswith(date)]
-        orders.sort(key=lambda x: x['date'], reverse=True)
-        filename = f"sales_report_{date}.pdf"
-    elif view == 'product':
-        orders = sorted(user_data['orders'], key=lambda x: x['date'], reverse=True)
-        filename = "product_sales_report.pdf"
-    else:
+    report = sales_report_args(user_data, request.args)
+    if report is None:
         return "Invalid parameters", 400
-
-    # Create PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30
+    filename, args = report
+    
+    key = report_cache_key(user_email, 'sales', request.args)
+    return send_file(
+        BytesIO(render_report(key, build_sales_report, args)),
+        as_attachment=True,
+        download_name=filename,
+        mimetype='application/pdf'
     )
 
-    # Add title and date info
-    elements.append(Paragraph(f"Sales Report - {user_data.get('company_name', 'Company')}", title_style))
-    elements.append(Spacer(1, 12))
-
-    if report_type == 'range':
-        date_info = f"Period: {start_date} to {end_date}"
-    elif view == 'today':
-        date_info = f"Date: {date}"
-    else:
-        date_info = "Overall Sales Report"
-    elements.append(Paragraph(date_info, styles["Normal"]))
-    elements.append(Spacer(1, 20))
-
-    # Prepare data
-    if view == 'product':
-        # Product-wise summary with date range info
-        product_sales = {}
-        date_range = {'earliest': None, 'latest': None}
-        
-        for order in orders:
-            order_date = datetime.strptime(order['date'], "%Y-%m-%d %H:%M:%S")
-            
-            # Update date range
-            if date_range['earliest'] is None or order_date < date_range['earliest']:
-                date_range['earliest'] = order_date
-            if date_range['latest'] is None or order_date > date_range['latest']:
-                date_range['latest'] = order_date
-                
-            for item in order['items']:
-                name = item['name']
-                if name not in product_sales:
-                    product_sales[name] = {'quantity': 0, 'revenue': 0}
-                product_sales[name]['quantity'] += item['quantity']
-                product_sales[name]['revenue'] += item['price'] * item['quantity']
-
-        # Add date range info for product view
-        if date_range['earliest'] and date_range['latest']:
-            elements.append(Paragraph(
-                f"Period: {date_range['earliest'].strftime('%Y-%m-%d')} to {date_range['latest'].strftime('%Y-%m-%d')}", 
-                styles["Normal"]
-            ))
-            elements.append(Spacer(1, 12))
-
-        table_data = [['Product', 'Quantity Sold', 'Revenue']]
-        for product, data in sorted(product_sales.items(), key=lambda x: x[1]['revenue'], reverse=True):
-            table_data.append([
-                product,
-                str(data['quantity']),
-                f"₹{data['revenue']:,.2f}"
-            ])
-    else:
-        # Order-wise details
-        table_data = [['Order ID', 'Date & Time', 'Customer', 'Items', 'Total']]
-        for i, order in enumerate(orders, 1):
-            items_str = "\n".join([f"{item['name']} (x{item['quantity']})" for item in order['items']])
-            # Parse and format the date for better readability
-            order_date = datetime.strptime(order['date'], "%Y-%m-%d %H:%M:%S")
-            formatted_date = order_date.strftime("%Y-%m-%d %I:%M %p")
-            
-            table_data.append([
-                f"#{i:05d}",
-                formatted_date,
-                order['customer'],
-                items_str,
-                f"₹{order['total']:,.2f}"
-            ])
-
-    # Create table with adjusted column widths
-    if view == 'product':
-        col_widths = [250, 100, 150]  # Adjusted for product view
+# Background report jobs: submit, poll, then download
+@app.route('/reports', methods=['POST'])
+@login_required
+def submit_report():
+    user_email = session['user_email']
+    user_data = init_user_if_needed(user_email)
+    params = request.get_json(silent=True) or request.form
+    
+    if params.get('kind', 'sales') == 'summary':
+        filename, args = summary_report_args(user_data)
+        key = report_cache_key(user_email, filename, {})
+        builder = build_summary_report
     else:
-        col_widths = [60, 120, 100, 200, 80]  # Adjusted for order view
+        report = sales_report_args(user_data, params)
+        if report is None:
+            return jsonify({"success": False, "message": "Invalid parameters"}), 400
+        filename, args = report
+        key = report_cache_key(user_email, 'sales', params)
+        builder = build_sales_report
     
-    table = Table(table_data, repeatRows=1, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        # Align specific columns
-        ('ALIGN', (3, 1), (3, -1), 'LEFT'),  # Items column left-aligned
-        ('ALIGN', (-1, 1), (-1, -1), 'RIGHT'),  # Total column right-aligned
-    ]))
-    elements.append(table)
-    elements.append(Spacer(1, 20))
-
-    # Add summary
-    total_sales = sum(order['total'] for order in orders)
-    elements.append(Paragraph(f"Total Sales: ₹{total_sales:,.2f}", styles["Heading3"]))
-    elements.append(Paragraph(f"Number of Orders: {len(orders)}", styles["Normal"]))
-
-    # Generate PDF
-    doc.build(elements)
-    buffer.seek(0)
+    try:
+        job_id = report_jobs.submit(user_email, filename, render_report, key, builder, args)
+    except JobLimitError as e:
+        return jsonify({"success": False, "message": str(e)}), 429
+    
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status_url": url_for('report_status', job_id=job_id),
+        "download_url": url_for('download_report', job_id=job_id)
+    }), 202
 
+@app.route('/reports/<job_id>')
+@login_required
+def report_status(job_id):
+    status = report_jobs.status(job_id, session['user_email'])
+    if status is None:
+        return jsonify({"success": False, "message": "Report not found"}), 404
+    status.pop('user', None)
+    return jsonify(dict(status, success=True))
+
+@app.route('/reports/<job_id>/download')
+@login_required
+def download_report(job_id):
+    status = report_jobs.status(job_id, session['user_email'])
+    if status is None:
+        return "Report not found", 404
+    if status['status'] != 'done':
+        return jsonify({"success": False, "message": f"Report is {status['status']}"}), 409
     return send_file(
-        buffer,
+        report_jobs.result_path(job_id),
         as_attachment=True,
-        download_name=filename,
+        download_name=status['filename'],
         mimetype='application/pdf'
     )
 
+# Streaming CSV/NDJSON exports for BI jobs
+@app.route('/export/<dataset>')
+@login_required
+def export_data(dataset):
+    user_email = session['user_email']
+    user_data = init_user_if_needed(user_email)
+    
+    fmt = request.args.get('format', 'csv')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    if dataset not in EXPORT_COLUMNS or fmt not in EXPORT_MIMETYPES:
+        return "Invalid parameters", 400
+    
+    # Dates are inclusive calendar days
+    try:
+        start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else None
+        end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1) if end_date else None
+    except ValueError:
+        return "Invalid parameters", 400
+    
+    filename = f"{dataset}_{start_date or 'start'}_to_{end_date or 'now'}.{fmt}"
+    return Response(export_chunks(user_data, dataset, fmt, start, end),
+                    mimetype=EXPORT_MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'X-Accel-Buffering': 'no'})
+
 if __name__ == '__main__':
     app.run(debug=True)
 
@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryArchive:
+    """Append-only on-disk store of a user's older history entries in NDJSON segments by day
+
+    Segments are named {date}-{first seq}.ndjson and a new one starts
+    whenever an entry's date differs from the current segment's or the
+    current one holds SEGMENT_ENTRIES entries, so finding a page parses at
+    most one segment past it. Each line is [seq, entry]. Appends at or
+    below the last stored seq are ignored, so replaying a journal over an
+    archive cannot duplicate entries.
+    """
+
+    SEGMENT_ENTRIES = 10000
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+        self._segments = []  # (first seq, date, path), by first seq
+        for name in os.listdir(directory):
+            if not name.endswith('.ndjson'):
+                continue
+            date, _, first = name[:-len('.ndjson')].rpartition('-')
+            if first.isdigit():
+                self._segments.append((int(first), date, os.path.join(directory, name)))
+        self._segments.sort()
+        self._next_seq = self._recover()
+
+    def _recover(self):
+        """Drop a torn last line left by a crash and return the seq after the last stored entry"""
+        if not self._segments:
+            return 0
+        path = self._segments[-1][2]
+        with open(path, 'rb') as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            logger.warning("Truncating %d bytes of incomplete history in %s", len(data) - end, path)
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+        lines = data[:end].splitlines()
+        return json.loads(lines[-1])[0] + 1 if lines else self._segments[-1][0]
+
+    def append(self, seq, entry):
+        with self._lock:
+            if seq < self._next_seq:
+                return
+            date = (entry.get('date') or '')[:10] or 'undated'
+            if (not self._segments or self._segments[-1][1] != date
+                    or seq - self._segments[-1][0] >= self.SEGMENT_ENTRIES):
+                self._segments.append((seq, date, os.path.join(self.directory, f"{date}-{seq:012d}.ndjson")))
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+            if self._file is None:
+                self._file = open(self._segments[-1][2], 'a')
+            self._file.write(json.dumps([seq, entry]) + "\n")
+            self._file.flush()
+            self._next_seq = seq + 1
+
+    def sync(self):
+        """Make appended entries durable"""
+        with self._lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _read(self, path):
+        with open(path) as f:
+            for line in f:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+
+    def before(self, end, action=None):
+        """Yield (seq, entry) for entries numbered below `end`, newest first"""
+        with self._lock:
+            segments = list(self._segments)
+        index = bisect_left(segments, (end,))
+        for _, _, path in reversed(segments[:index]):
+            for seq, entry in reversed(list(self._read(path))):
+                if seq < end and (action is None or entry.get('action') == action):
+                    yield seq, entry
+
+    def entries(self, end=None):
+        """Yield entries numbered below `end`, oldest first"""
+        with self._lock:
+            segments = list(self._segments)
+        for _, _, path in segments:
+            for seq, entry in self._read(path):
+                if end is not None and seq >= end:
+                    return
+                yield entry
@@ -0,0 +1,71 @@
+"""Benchmark: ingesting orders through /add_orders batches versus one /add_order call each
+
+Usage: python benchmarks/batch_orders.py --orders 2000 --batch 200 --items 500
+
+Runs the app in-process through Flask's test client against a temporary
+database. Each mode gets a fresh user with --items inventory items and
+places the same --orders orders of three lines each.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(prefix='batch-bench-'), 'bench.db'))
+
+from app import app
+
+
+def make_client(email, items, stock):
+    client = app.test_client()
+    client.post('/register', data={'email': email, 'username': email.split('@')[0], 'password': 'password'})
+    client.post('/login', data={'email': email, 'password': 'password'})
+    for n in range(items):
+        client.post('/add_item', data={'name': f"Item {n}", 'category': f"Category {n % 10}",
+                                       'quantity': stock, 'price': 1.0 + n % 7})
+    return client
+
+
+def make_orders(count, items):
+    rng = random.Random(42)
+    return [{'customer': f"Customer {n % 50}",
+             'items': [{'name': f"Item {rng.randrange(items)}", 'quantity': 1} for _ in range(3)]}
+            for n in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=200)
+    parser.add_argument('--items', type=int, default=500)
+    args = parser.parse_args()
+    orders = make_orders(args.orders, args.items)
+    stock = args.orders * 3
+
+    client = make_client('single@example.com', args.items, stock)
+    began = time.perf_counter()
+    for order in orders:
+        response = client.post('/add_order', data={
+            'customer': order['customer'],
+            'items': [line['name'] for line in order['items']],
+            'quantities': [str(line['quantity']) for line in order['items']]})
+        assert response.status_code == 200, response.get_json()
+    single = time.perf_counter() - began
+
+    client = make_client('batch@example.com', args.items, stock)
+    began = time.perf_counter()
+    for start in range(0, len(orders), args.batch):
+        response = client.post('/add_orders', json={'orders': orders[start:start + args.batch]})
+        assert response.status_code == 200, response.get_json()
+    batched = time.perf_counter() - began
+
+    print(f"/add_order  x{args.orders}: {single:7.2f} s  {args.orders / single:9.0f} orders/s")
+    print(f"/add_orders x{-(-args.orders // args.batch)} (batch {args.batch}): {batched:7.2f} s  "
+          f"{args.orders / batched:9.0f} orders/s  ({single / batched:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark: reading a long history back from the archive of each backend
+
+Usage: python benchmarks/history_archive.py --entries 100000,300000,600000
+
+For each size, writes that many history entries for one user, closes the
+repository cleanly and reopens it, then times a full oldest-first pass
+(what /export/history streams) and the page of 50 entries that sits
+halfway back. Checks that the pass returns every entry in order and that
+the numbering survived the clean shutdown.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from storage import JournalRepository, SQLiteRepository
+
+EMAIL = "bench@example.com"
+
+
+def open_repo(backend, directory):
+    if backend == 'sqlite':
+        return SQLiteRepository(os.path.join(directory, 'inventory.db'))
+    return JournalRepository(directory, snapshot_interval=3600)
+
+
+def fill(repo, count, batch=10000):
+    repo.create_user(EMAIL, "bench", "password")
+    date = datetime(2024, 1, 1).strftime('%Y-%m-%d %H:%M:%S')
+    for start in range(0, count, batch):
+        repo.add_history_entries(EMAIL, [{'action': 'add', 'item': f"Item {n}", 'date': date}
+                                         for n in range(start, min(start + batch, count))])
+        repo.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', default="100000,300000,600000", help="history lengths to test")
+    parser.add_argument('--backends', default="sqlite,journal")
+    args = parser.parse_args()
+
+    for backend in args.backends.split(','):
+        for count in [int(n) for n in args.entries.split(',')]:
+            directory = tempfile.mkdtemp(prefix='history-bench-')
+            try:
+                repo = open_repo(backend, directory)
+                fill(repo, count)
+                repo.close()
+
+                repo = open_repo(backend, directory)
+                history = repo.get_user(EMAIL)['history']
+                assert len(history) == count, (len(history), count)
+
+                began = time.perf_counter()
+                items = [entry['item'] for entry in history]
+                full = time.perf_counter() - began
+                assert items == [f"Item {n}" for n in range(count)]
+
+                began = time.perf_counter()
+                page = history.page(count // 2, 50)
+                middle = time.perf_counter() - began
+                assert [seq for seq, _ in page] == list(range(count // 2 - 1, count // 2 - 51, -1))
+
+                print(f"{backend:>7} entries={count:>8} full pass={full:7.2f} s "
+                      f"middle page={middle * 1000:7.1f} ms")
+                repo.close()
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
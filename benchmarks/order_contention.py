@@ -0,0 +1,145 @@
+"""Benchmark: concurrent /add_order requests, checking for overselling and measuring throughput
+
+Usage: python benchmarks/order_contention.py --threads 1,2,4,8 --orders 500
+
+Oversell check: --threads-max threads race to buy one unit at a time of a
+single item stocked with --stock units. They must sell exactly --stock
+units and leave the quantity at zero.
+
+Read check: for --read-seconds, one thread adds and deletes items of a
+user stocked with --catalog items while --threads-max threads load its
+dashboard and analytics pages. Every read must succeed.
+
+Throughput: for each thread count, every thread places --orders orders,
+first each thread as its own user (tenants run concurrently), then all
+threads as one user (serialised by that user's lock).
+
+Runs the app in-process through Flask's test client against a temporary
+database.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DATABASE_PATH', os.path.join(tempfile.mkdtemp(prefix='contention-bench-'), 'bench.db'))
+
+from app import app, repo
+
+
+def user_email(i):
+    return f"user{i}@example.com"
+
+
+def logged_in_client(user):
+    client = app.test_client()
+    client.post('/login', data={'email': user_email(user), 'password': 'password'})
+    return client
+
+
+def setup_user(user, stock):
+    client = app.test_client()
+    client.post('/register', data={'email': user_email(user), 'username': f"user{user}", 'password': 'password'})
+    client = logged_in_client(user)
+    client.post('/add_item', data={'name': 'Widget', 'category': 'Bench', 'quantity': stock, 'price': 2.5})
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - began
+
+
+def oversell_check(threads, stock, user):
+    setup_user(user, stock)
+    sold = []
+
+    def buyer(_):
+        client = logged_in_client(user)
+        while True:
+            response = client.post('/add_order', data={'customer': 'Bench', 'items': ['Widget'],
+                                                       'quantities': ['1']})
+            if response.status_code != 200:
+                break
+            sold.append(1)
+
+    run_threads(threads, buyer)
+    remaining = repo.get_user(user_email(user))['inventory'].find_by_name('Widget')['quantity']
+    print(f"oversell check: threads={threads} stock={stock} sold={len(sold)} remaining={remaining} "
+          f"{'OK' if len(sold) == stock and remaining == 0 else 'OVERSOLD'}")
+
+
+def read_check(threads, catalog, seconds, user):
+    setup_user(user, 100)
+    rows = "".join(f"Item {n},Cat {n % 20},{n % 30},1.0\n" for n in range(catalog))
+    logged_in_client(user).post('/import_inventory?format=csv', data="name,category,quantity,price\n" + rows,
+                                content_type='text/csv')
+    deadline = time.monotonic() + seconds
+    reads, failures, writes = [], [], []
+
+    def writer():
+        client = logged_in_client(user)
+        n = 0
+        while time.monotonic() < deadline:
+            client.post('/add_item', data={'name': 'new', 'newItemName': f"Churn {n}", 'category': 'Churn',
+                                           'quantity': 1, 'price': 1.0})
+            item = repo.get_user(user_email(user))['inventory'].find_by_name(f"Churn {n}")
+            client.post(f"/delete_item/{item['id']}")
+            writes.append(2)
+            n += 1
+
+    def reader(i):
+        client = logged_in_client(user)
+        while time.monotonic() < deadline:
+            response = client.get('/dashboard' if i % 2 else '/analytics')
+            (reads if response.status_code == 200 else failures).append(response.status_code)
+
+    churn = threading.Thread(target=writer)
+    churn.start()
+    run_threads(threads, reader)
+    churn.join()
+    print(f"read check: threads={threads} catalog={catalog} writes={sum(writes)} reads={len(reads)} "
+          f"failed={len(failures)} {'OK' if not failures else 'FAILED'}")
+
+
+def throughput(threads, orders, first_user, shared_user):
+    def placer(i):
+        client = logged_in_client(shared_user if shared_user is not None else first_user + i)
+        for _ in range(orders):
+            client.post('/add_order', data={'customer': 'Bench', 'items': ['Widget'], 'quantities': ['1']})
+
+    return threads * orders / run_threads(threads, placer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', default="1,2,4,8")
+    parser.add_argument('--orders', type=int, default=500, help="orders per thread")
+    parser.add_argument('--stock', type=int, default=1000)
+    parser.add_argument('--catalog', type=int, default=5000)
+    parser.add_argument('--read-seconds', type=float, default=10)
+    args = parser.parse_args()
+    thread_counts = [int(t) for t in args.threads.split(',')]
+
+    oversell_check(max(thread_counts), args.stock, user=0)
+    read_check(max(thread_counts), args.catalog, args.read_seconds, user=1)
+
+    next_user = 2
+    for threads in thread_counts:
+        for user in range(next_user, next_user + threads + 1):
+            setup_user(user, args.orders * threads)
+        tenants = throughput(threads, args.orders, next_user, None)
+        single = throughput(threads, args.orders, next_user, next_user + threads)
+        next_user += threads + 1
+        print(f"threads={threads:>3} separate tenants {tenants:8.0f} orders/s   one tenant {single:8.0f} orders/s")
+
+
+if __name__ == '__main__':
+    main()
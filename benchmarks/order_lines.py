@@ -0,0 +1,94 @@
+"""Benchmark: Python loops over order dicts versus vectorized group-bys on the columnar OrderLines store
+
+Usage: python benchmarks/order_lines.py --lines 1000000 --products 2000
+
+Builds one tenant with --lines order lines (three per order) spread over a
+year. Times the 30-day forecasting aggregation and a date-range product
+totals query both ways, and checks that the results agree.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from store import OrderLog, SalesAggregates
+
+
+def make_orders(lines, products, end):
+    rng = random.Random(7)
+    start = end - timedelta(days=365)
+    orders = []
+    for n in range(lines // 3):
+        date = start + timedelta(seconds=rng.randrange(365 * 86400))
+        items = [{'name': f"Product {rng.randrange(products)}", 'quantity': rng.randint(1, 5),
+                  'price': float(rng.randint(1, 500))} for _ in range(3)]
+        orders.append({'id': n + 1, 'customer': 'Bench', 'items': items,
+                       'total': sum(item['quantity'] * item['price'] for item in items), 'date': date})
+    return orders
+
+
+def loop_forecast(orders, window_start):
+    forecast = {}
+    for order in orders.between(window_start):
+        order_date = order['date'].date()
+        for item in order['items']:
+            data = forecast.setdefault(item['name'], {'total_quantity': 0, 'days_with_sales': set()})
+            data['total_quantity'] += item['quantity']
+            data['days_with_sales'].add(order_date)
+    return {name: (data['total_quantity'], len(data['days_with_sales'])) for name, data in forecast.items()}
+
+
+def loop_product_totals(orders, start, end):
+    totals = {}
+    for order in orders.between(start, end):
+        for item in order['items']:
+            data = totals.setdefault(item['name'], {'name': item['name'], 'quantity': 0, 'revenue': 0})
+            data['quantity'] += item['quantity']
+            data['revenue'] += item['price'] * item['quantity']
+    return sorted(totals.values(), key=lambda x: x['revenue'], reverse=True)
+
+
+def timed(function, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=1000000)
+    parser.add_argument('--products', type=int, default=2000)
+    args = parser.parse_args()
+
+    end = datetime(2024, 12, 31)
+    began = time.perf_counter()
+    orders = OrderLog(make_orders(args.lines, args.products, end))
+    sales = SalesAggregates(orders)
+    print(f"built {len(sales.lines)} lines in {time.perf_counter() - began:.1f} s")
+
+    window_start = end - timedelta(days=30)
+    expected, loop_time = timed(loop_forecast, orders, window_start)
+    result, vector_time = timed(sales.lines.daily_activity, window_start)
+    assert result == expected
+    print(f"30-day forecast activity: loop {loop_time * 1000:8.1f} ms  vectorized {vector_time * 1000:7.1f} ms  "
+          f"({loop_time / vector_time:.0f}x)")
+
+    range_start, range_end = end - timedelta(days=180), end
+    expected, loop_time = timed(loop_product_totals, orders, range_start, range_end)
+    result, vector_time = timed(sales.lines.product_totals, range_start, range_end)
+    assert [row['name'] for row in result[:10]] == [row['name'] for row in expected[:10]]
+    assert all(abs(a['revenue'] - b['revenue']) < 1e-6 for a, b in zip(result, expected))
+    print(f"180-day product totals:   loop {loop_time * 1000:8.1f} ms  vectorized {vector_time * 1000:7.1f} ms  "
+          f"({loop_time / vector_time:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
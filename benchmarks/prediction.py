@@ -0,0 +1,71 @@
+"""Benchmark: the sales prediction path at growing order counts
+
+Usage: python benchmarks/prediction.py --sizes 10000 100000 1000000
+
+For each size, builds that many orders spread over two years and times
+the daily-totals preparation both as the old per-order dict loop and as
+the bincount version, then the full get_prediction_data call (prepare,
+fit, predict and score).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from prediction import SalesPrediction, daily_totals
+from store import parse_order_date
+
+
+def make_orders(count, days=730):
+    rng = random.Random(11)
+    start = datetime.now() - timedelta(days=days)
+    return [{'date': start + timedelta(seconds=rng.randrange(days * 86400)), 'total': rng.uniform(5, 500)}
+            for _ in range(count)]
+
+
+def loop_daily_totals(orders):
+    daily_sales = {}
+    for order in orders:
+        date = parse_order_date(order['date']).date()
+        if date not in daily_sales:
+            daily_sales[date] = 0
+        daily_sales[date] += float(order.get('total', 0))
+    sorted_dates = sorted(daily_sales.keys())
+    return sorted_dates, [daily_sales[date] for date in sorted_dates]
+
+
+def timed(function, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'orders':>9}  {'loop prepare':>13}  {'bincount':>10}  {'full predict':>13}")
+    for size in args.sizes:
+        orders = make_orders(size)
+        (dates, expected), loop_time = timed(loop_daily_totals, orders)
+        (days, totals), vector_time = timed(daily_totals, orders)
+        assert [date.toordinal() for date in dates] == days.tolist()
+        assert np.allclose(expected, totals)
+        result, predict_time = timed(SalesPrediction().get_prediction_data, orders)
+        assert result['error'] is None
+        print(f"{size:>9}  {loop_time * 1000:>10.1f} ms  {vector_time * 1000:>7.1f} ms  {predict_time * 1000:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark: per-product demand forecasts for a whole catalog
+
+Usage: python benchmarks/sku_forecast.py --products 50000 --lines 1000000 --workers 4
+
+Builds one tenant with --products inventory items and --lines order lines
+over the last 90 days, then times forecast_products serially and with a
+thread pool of --workers, and a per-product np.polyfit loop on a sample
+of the catalog for comparison.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from forecasting import FORECAST_WINDOW_DAYS, fit_trends, forecast_products
+from store import InventoryStore, OrderLog, SalesAggregates
+
+
+def make_user(products, lines):
+    rng = random.Random(3)
+    now = datetime.now()
+    inventory = InventoryStore([{'id': n + 1, 'name': f"SKU {n}", 'category': None, 'quantity': rng.randint(0, 500),
+                                 'price': 10.0} for n in range(products)])
+    orders = []
+    for n in range(lines // 5):
+        items = [{'name': f"SKU {rng.randrange(products)}", 'quantity': rng.randint(1, 4), 'price': 10.0}
+                 for _ in range(5)]
+        orders.append({'id': n + 1, 'customer': 'Bench', 'items': items, 'total': 0,
+                       'date': now - timedelta(seconds=rng.randrange(FORECAST_WINDOW_DAYS * 86400))})
+    orders = OrderLog(orders)
+    return {'inventory': inventory, 'orders': orders, 'sales': SalesAggregates(orders)}
+
+
+def timed(function, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--lines', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    user_data = make_user(args.products, args.lines)
+    start = datetime.combine(datetime.now().date() - timedelta(days=FORECAST_WINDOW_DAYS - 1), datetime.min.time())
+    names, series = user_data['sales'].lines.daily_quantities(start, FORECAST_WINDOW_DAYS)
+    print(f"{args.products} products, {len(names)} sold in the last {FORECAST_WINDOW_DAYS} days")
+
+    forecasts, serial_time = timed(forecast_products, user_data)
+    assert len(forecasts) == args.products
+    print(f"serial:            {serial_time * 1000:8.1f} ms")
+    with ThreadPoolExecutor(args.workers) as executor:
+        _, pooled_time = timed(forecast_products, user_data, 30, FORECAST_WINDOW_DAYS, executor)
+    print(f"{args.workers} threads:         {pooled_time * 1000:8.1f} ms")
+
+    # Fitting products one at a time, extrapolated from a sample
+    sample = series[:1000]
+    _, loop_time = timed(lambda: [np.polyfit(np.arange(FORECAST_WINDOW_DAYS), row, 1) for row in sample], repeat=1)
+    print(f"polyfit per product: {loop_time * len(series) / len(sample) * 1000:8.1f} ms (extrapolated)")
+
+    intercept, slope, _ = fit_trends(sample)
+    expected = np.array([np.polyfit(np.arange(FORECAST_WINDOW_DAYS), row, 1) for row in sample])
+    assert np.allclose(slope, expected[:, 0]) and np.allclose(intercept, expected[:, 1])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark: open SSE connections against the asyncio stream server and record its memory and CPU
+
+Usage: python benchmarks/sse_connections.py --connections 10000 --users 100
+
+The server runs in a child process (the same SSEServer the app starts when
+SSE_PORT is set) so that its RSS and CPU time are measured on their own.
+While connections are held, the child publishes changes at --rate per second
+to random users. Raise the open file limit first, e.g. `ulimit -n 65536`.
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def user_email(i):
+    return f"user{i}@example.com"
+
+
+def serve(args):
+    from app import app, users, changes, sse_server, init_user_data
+
+    for i in range(args.users):
+        user_data = init_user_data(user_email(i), f"user{i}", "password")
+        for n in range(20):
+            user_data['inventory'].add({'name': f"Item {n}", 'category': 'Bench',
+                                        'quantity': random.randint(0, 20), 'price': 10.0})
+    sse_server.start('127.0.0.1', args.port)
+    print("ready", flush=True)
+
+    interval = 1.0 / args.rate if args.rate else None
+    while True:
+        if interval is None:
+            time.sleep(3600)
+            continue
+        time.sleep(interval)
+        email = user_email(random.randrange(args.users))
+        inventory = users[email]['inventory']
+        item = inventory.get(random.randint(1, 20))
+        inventory.adjust_quantity(item, random.choice([-5, 5]) if item['quantity'] >= 5 else 5)
+        changes.publish(email, item_ids=[item['id']])
+
+
+def process_stats(pid):
+    with open(f"/proc/{pid}/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    return rss_kb / 1024, cpu_seconds
+
+
+async def hold(port, cookie, received):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET /stream HTTP/1.1\r\nHost: localhost\r\nCookie: session={cookie}\r\n\r\n".encode())
+    await writer.drain()
+    try:
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                break
+            received[0] += chunk.count(b"data: ")
+    finally:
+        writer.close()
+
+
+async def run(args):
+    from app import app
+
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookies = [serializer.dumps({'user_email': user_email(i), 'username': f"user{i}"})
+               for i in range(args.users)]
+
+    server = subprocess.Popen([sys.executable, __file__, '--serve', '--port', str(args.port),
+                               '--users', str(args.users), '--rate', str(args.rate)],
+                              stdout=subprocess.PIPE, text=True)
+    assert server.stdout.readline().strip() == "ready"
+
+    received = [0]
+    tasks = []
+    steps = sorted({s for s in (100, 1000, 2500, 5000, 10000, 20000) if s < args.connections} | {args.connections})
+    base_rss, _ = process_stats(server.pid)
+    print(f"{'connections':>12} {'rss_mb':>8} {'kb/conn':>8} {'cpu_%':>6} {'events/s':>9}")
+    try:
+        for step in steps:
+            while len(tasks) < step:
+                tasks.append(asyncio.ensure_future(hold(args.port, cookies[len(tasks) % args.users], received)))
+                if len(tasks) % 500 == 0:
+                    await asyncio.sleep(0.05)
+            await asyncio.sleep(1)
+
+            rss_before, cpu_before = process_stats(server.pid)
+            events_before = received[0]
+            await asyncio.sleep(args.window)
+            rss, cpu = process_stats(server.pid)
+            per_conn = (rss - base_rss) * 1024 / step
+            cpu_pct = 100 * (cpu - cpu_before) / args.window
+            events = (received[0] - events_before) / args.window
+            print(f"{step:>12} {rss:>8.1f} {per_conn:>8.1f} {cpu_pct:>6.1f} {events:>9.0f}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        server.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=50, help='changes published per second')
+    parser.add_argument('--window', type=float, default=5, help='seconds measured per step')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
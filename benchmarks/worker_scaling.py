@@ -0,0 +1,144 @@
+"""Benchmark: request throughput of the app under gunicorn with 1 to N workers sharing one database
+
+Usage: python benchmarks/worker_scaling.py --workers 1,2,4 --clients 16 --duration 10
+
+For each worker count, starts `gunicorn app:app` with SHARED_STATE=1 on a
+fresh database, registers --users users, each seeded with --items items
+and --orders orders, and drives it from --clients client processes. Each
+client logs in as one user and loops over page reads, with --write-ratio
+of its requests adding stock via /add_item. Every write makes the other
+workers bring that user up to date, so large tenants show what that
+costs. Prints requests per second and the speedup over the first worker
+count. Needs gunicorn and the app's requirements installed.
+"""
+import argparse
+import http.cookiejar
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+READ_PATHS = ['/dashboard', '/inventory', '/orders', '/analytics']
+
+
+def user_email(i):
+    return f"user{i}@example.com"
+
+
+def post(opener, base, path, fields):
+    data = urllib.parse.urlencode(fields).encode()
+    with opener.open(base + path, data=data, timeout=30) as response:
+        return response.read()
+
+
+def post_body(opener, base, path, body, content_type):
+    request = urllib.request.Request(base + path, data=body, headers={'Content-Type': content_type})
+    with opener.open(request, timeout=300) as response:
+        return response.read()
+
+
+def seed(base, user, items, orders):
+    """Give a user `items` inventory items and `orders` one-line orders"""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    post(opener, base, '/login', {'email': user_email(user), 'password': 'password'})
+    if items:
+        rows = "".join(f"Seed {n},Seed,1000000,5.0\n" for n in range(items))
+        post_body(opener, base, '/import_inventory?format=csv', ("name,category,quantity,price\n" + rows).encode(),
+                  'text/csv')
+    for start in range(0, orders, 1000):
+        batch = [{'customer': 'Bench', 'items': [{'name': f"Seed {n % max(items, 1)}", 'quantity': 1}]}
+                 for n in range(start, min(start + 1000, orders))]
+        post_body(opener, base, '/add_orders', json.dumps({'orders': batch}).encode(), 'application/json')
+
+
+def client(base, user, duration, write_ratio, results):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    post(opener, base, '/login', {'email': user_email(user), 'password': 'password'})
+    done = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            if random.random() < write_ratio:
+                post(opener, base, '/add_item', {'name': f"Item {random.randrange(50)}", 'category': 'Bench',
+                                                 'quantity': 1, 'price': 5.0})
+            else:
+                with opener.open(base + random.choice(READ_PATHS), timeout=30) as response:
+                    response.read()
+            done += 1
+        except (urllib.error.URLError, OSError):
+            errors += 1
+    results.put((done, errors))
+
+
+def wait_until_up(base, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base + '/login', timeout=1).read()
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start")
+
+
+def run(workers, args):
+    directory = tempfile.mkdtemp(prefix='worker-bench-')
+    env = dict(os.environ, SHARED_STATE='1', DATABASE_PATH=os.path.join(directory, 'bench.db'))
+    base = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app', '--workers', str(workers),
+                               '--bind', f"127.0.0.1:{args.port}", '--log-level', 'warning'],
+                              cwd=ROOT, env=env)
+    try:
+        wait_until_up(base)
+        opener = urllib.request.build_opener()
+        for i in range(args.users):
+            post(opener, base, '/register', {'email': user_email(i), 'username': f"user{i}",
+                                             'password': 'password'})
+            seed(base, i, args.items, args.orders)
+
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client, args=(base, i % args.users, args.duration,
+                                                                args.write_ratio, results))
+                   for i in range(args.clients)]
+        for process in clients:
+            process.start()
+        totals = [results.get() for _ in clients]
+        for process in clients:
+            process.join()
+        return sum(done for done, _ in totals) / args.duration, sum(errors for _, errors in totals)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default="1,2,4")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--items', type=int, default=0)
+    parser.add_argument('--orders', type=int, default=0)
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(',')]:
+        rate, errors = run(workers, args)
+        baseline = baseline or rate
+        print(f"workers={workers:>3} {rate:9.1f} req/s  speedup={rate / baseline:5.2f}x  errors={errors}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by the total size of its values
+
+    `size` measures a value (len() by default, i.e. bytes for PDFs or
+    characters for rendered fragments). Values bigger than the whole
+    budget are not cached.
+    """
+
+    def __init__(self, max_size, size=len):
+        self.max_size = max_size
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.size(value)
+        if size > self.max_size:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= old[1]
+            self._entries[key] = (value, size)
+            self._total += size
+            while self._total > self.max_size:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._total -= evicted
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'size': self._total, 'max_size': self.max_size,
+                    'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+SECONDS_PER_DAY = 86400
+
+
+def to_seconds(value):
+    """Seconds since the epoch of a naive datetime, keeping its wall-clock day boundaries"""
+    return (value - EPOCH) // timedelta(seconds=1)
+
+
+class OrderLines:
+    """Order lines mirrored as NumPy columns for vectorized analytics
+
+    Each line is one row of timestamp (seconds), product id (interned
+    name), quantity and unit price, plus the slot of the order it belongs
+    to. Arrays grow by doubling, so appends are amortized O(1). Removing an
+    order marks its rows dead; they are compacted away once they outnumber
+    the live rows. Slots increase in append order and compaction keeps
+    row order, so an order's rows are found by binary search on the slot
+    column.
+    """
+
+    COLUMNS = (('ts', np.int64), ('product', np.int32), ('quantity', np.int64),
+               ('price', np.float64), ('slot', np.int64), ('live', np.bool_))
+
+    def __init__(self, capacity=1024):
+        self.names = []
+        self._product_ids = {}
+        self._slots = {}
+        self._next_slot = 0
+        self._size = 0
+        self._dead = 0
+        for name, dtype in self.COLUMNS:
+            setattr(self, '_' + name, np.zeros(capacity, dtype=dtype))
+
+    def __len__(self):
+        return self._size - self._dead
+
+    def _product_id(self, name):
+        product_id = self._product_ids.get(name)
+        if product_id is None:
+            product_id = self._product_ids[name] = len(self.names)
+            self.names.append(name)
+        return product_id
+
+    def _reserve(self, count):
+        if self._size + count <= len(self._ts):
+            return
+        capacity = max(len(self._ts) * 2, self._size + count)
+        for name, _ in self.COLUMNS:
+            column = getattr(self, '_' + name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, '_' + name, grown)
+
+    def append(self, order):
+        """Add an order's lines"""
+        items = order.get('items', [])
+        slot = self._slots[id(order)] = self._next_slot
+        self._next_slot += 1
+        if not items:
+            return
+        self._reserve(len(items))
+        start, end = self._size, self._size + len(items)
+        self._ts[start:end] = to_seconds(order['date'])
+        self._product[start:end] = [self._product_id(item.get('name', 'Unknown')) for item in items]
+        self._quantity[start:end] = [item.get('quantity', 0) for item in items]
+        self._price[start:end] = [item.get('price', 0) for item in items]
+        self._slot[start:end] = slot
+        self._live[start:end] = True
+        self._size = end
+
+    def remove(self, order):
+        """Drop the lines of an order added earlier"""
+        slot = self._slots.pop(id(order), None)
+        if slot is None:
+            return
+        slots = self._slot[:self._size]
+        start, end = np.searchsorted(slots, slot, 'left'), np.searchsorted(slots, slot, 'right')
+        self._live[start:end] = False
+        self._dead += int(end - start)
+        if self._dead > len(self):
+            self._compact()
+
+    def _compact(self):
+        keep = self._live[:self._size]
+        count = int(keep.sum())
+        for name, _ in self.COLUMNS:
+            column = getattr(self, '_' + name)
+            column[:count] = column[:self._size][keep]
+        self._size = count
+        self._dead = 0
+
+    def _select(self, start, end, *columns):
+        """Return the named columns of live rows with start <= timestamp < end
+
+        The row count is read once, so rows appended meanwhile by another
+        thread are left out rather than misaligning the columns.
+        """
+        size = self._size
+        ts = self._ts[:size]
+        mask = self._live[:size].copy()
+        if start is not None:
+            mask &= ts >= to_seconds(start)
+        if end is not None:
+            mask &= ts < to_seconds(end)
+        return [getattr(self, '_' + name)[:size][mask] for name in columns]
+
+    def product_totals(self, start=None, end=None, count=None):
+        """Return product quantity and revenue totals in a date range, highest revenue first"""
+        products, quantity, price = self._select(start, end, 'product', 'quantity', 'price')
+        revenue = quantity * price
+        size = len(self.names)
+        quantities = np.bincount(products, weights=quantity, minlength=size)
+        revenues = np.bincount(products, weights=revenue, minlength=size)
+        sold = np.flatnonzero(np.bincount(products, minlength=size))
+        ranked = sold[np.argsort(-revenues[sold], kind='stable')][:count]
+        return [{'name': self.names[p], 'quantity': int(quantities[p]), 'revenue': float(revenues[p])}
+                for p in ranked]
+
+    def daily_activity(self, start=None, end=None):
+        """Return each product's total quantity and number of distinct days with sales in a date range"""
+        products, ts, quantity = self._select(start, end, 'product', 'ts', 'quantity')
+        products = products.astype(np.int64)
+        days = ts // SECONDS_PER_DAY
+        size = len(self.names)
+        quantities = np.bincount(products, weights=quantity, minlength=size)
+        # Distinct (product, day) pairs, then count them per product
+        if len(days):
+            pairs = np.unique(products * (days.max() - days.min() + 1) + (days - days.min()))
+            day_counts = np.bincount(pairs // (days.max() - days.min() + 1), minlength=size)
+        else:
+            day_counts = np.zeros(size, dtype=np.int64)
+        sold = np.flatnonzero(day_counts)
+        return {self.names[p]: (int(quantities[p]), int(day_counts[p])) for p in sold}
+
+    def daily_quantities(self, start, days):
+        """Return the names of products sold in `days` days from start and a products x days matrix of quantities"""
+        products, ts, quantity = self._select(start, start + timedelta(days=days), 'product', 'ts', 'quantity')
+        offsets = (ts - to_seconds(start)) // SECONDS_PER_DAY
+        sold = np.flatnonzero(np.bincount(products, minlength=len(self.names)))
+        # Map product ids to matrix rows, then sum into a flattened (row, day) index
+        rows = np.zeros(len(self.names), dtype=np.int64)
+        rows[sold] = np.arange(len(sold))
+        cells = rows[products] * days + offsets
+        matrix = np.bincount(cells, weights=quantity, minlength=len(sold) * days)
+        return [self.names[p] for p in sold], matrix.reshape(len(sold), days)
@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeBus:
+    """Per-user change notifications that mutation routes publish and streams wait on"""
+
+    def __init__(self, backlog=256):
+        self._lock = threading.Lock()
+        self._conditions = {}
+        self._versions = {}
+        self._events = {}
+        self._backlog = backlog
+        self._listeners = []
+
+    def _condition(self, email):
+        condition = self._conditions.get(email)
+        if condition is None:
+            condition = self._conditions[email] = threading.Condition(self._lock)
+        return condition
+
+    def version(self, email):
+        """Return the user's current data version"""
+        with self._lock:
+            return self._versions.get(email, 0)
+
+    def add_listener(self, callback):
+        """Call callback(email, version, item_ids) after every publish, from the publishing thread"""
+        self._listeners.append(callback)
+
+    def publish(self, email, item_ids=()):
+        """Record a change to a user's data, waking only that user's listeners
+
+        Pass item_ids=None when the touched items are unknown, which makes
+        listeners resynchronise in full.
+        """
+        item_ids = frozenset(item_ids) if item_ids is not None else None
+        with self._lock:
+            version = self._versions.get(email, 0) + 1
+            self._versions[email] = version
+            events = self._events.get(email)
+            if events is None:
+                events = self._events[email] = deque(maxlen=self._backlog)
+            events.append((version, item_ids))
+            self._condition(email).notify_all()
+        for callback in self._listeners:
+            callback(email, version, item_ids)
+        return version
+
+    def wait(self, email, since, timeout=None):
+        """Block until the user's version passes `since` or the timeout expires
+
+        Returns the current version and the ids of inventory items touched
+        since then. The ids are None if the listener fell further behind
+        than the backlog, in which case it should resynchronise in full.
+        """
+        with self._lock:
+            self._condition(email).wait_for(
+                lambda: self._versions.get(email, 0) > since, timeout)
+            version = self._versions.get(email, 0)
+            if version <= since:
+                return version, set()
+            events = [event for event in self._events[email] if event[0] > since]
+            if not events or events[0][0] != since + 1:
+                return version, None
+            item_ids = set()
+            for _, ids in events:
+                if ids is None:
+                    return version, None
+                item_ids |= ids
+            return version, item_ids
+
+
+class ChangeRelay:
+    """Polls for changes other processes committed and republishes them on the local ChangeBus
+
+    poll(since) must return the new high-water mark and the emails changed
+    after `since` by other processes.
+    """
+
+    def __init__(self, changes, poll, latest, interval=0.5):
+        self.changes = changes
+        self.poll = poll
+        self.latest = latest
+        self.interval = interval
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Poll in a background thread; later calls are no-ops"""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self.run, name='change-relay', daemon=True).start()
+
+    def run(self):
+        since = self.latest()
+        while True:
+            time.sleep(self.interval)
+            try:
+                since, emails = self.poll(since)
+            except Exception as e:
+                logger.warning("Change poll failed: %s", e)
+                continue
+            for email in emails:
+                self.changes.publish(email, item_ids=None)
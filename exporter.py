@@ -0,0 +1,95 @@
+import csv
+import json
+from io import StringIO
+
+from store import DATE_FORMAT, format_order_date
+
+EXPORT_COLUMNS = {
+    'orders': ('id', 'date', 'customer', 'total', 'item_count'),
+    'order_lines': ('order_id', 'date', 'customer', 'name', 'quantity', 'price', 'line_total'),
+    'inventory': ('id', 'name', 'category', 'quantity', 'price', 'expiry_date', 'date_added'),
+    'history': ('date', 'action', 'item', 'order_id', 'customer')
+}
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+FLUSH_ROWS = 500  # Rows buffered per chunk sent to the client
+
+
+def order_rows(orders):
+    for order in orders:
+        yield {
+            'id': order.get('id'),
+            'date': format_order_date(order['date']),
+            'customer': order.get('customer'),
+            'total': order.get('total'),
+            'item_count': len(order.get('items', []))
+        }
+
+
+def order_line_rows(orders):
+    for order in orders:
+        date = format_order_date(order['date'])
+        for item in order.get('items', []):
+            yield {
+                'order_id': order.get('id'),
+                'date': date,
+                'customer': order.get('customer'),
+                'name': item.get('name'),
+                'quantity': item.get('quantity'),
+                'price': item.get('price'),
+                'line_total': item.get('quantity', 0) * item.get('price', 0)
+            }
+
+
+def dated_rows(entries, key, start=None, end=None):
+    """Yield entries whose string date is within [start, end); the dates sort as text"""
+    start = start.strftime(DATE_FORMAT) if start else None
+    end = end.strftime(DATE_FORMAT) if end else None
+    for entry in entries:
+        date = entry.get(key) or ''
+        if (start is None or date >= start) and (end is None or date < end):
+            yield entry
+
+
+def csv_chunks(rows, columns):
+    """Encode rows as CSV with a header, a few hundred rows per yielded chunk"""
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, columns, extrasaction='ignore')
+    writer.writeheader()
+    # Send the header at once so the download starts before any rows are encoded
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(rows, columns):
+    """Encode rows as newline-delimited JSON, a few hundred rows per yielded chunk"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({column: row.get(column) for column in columns}))
+        if len(lines) == FLUSH_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def export_chunks(user_data, dataset, fmt, start=None, end=None):
+    """Generate an export of one dataset; start and end are datetimes bounding the rows"""
+    if dataset in ('orders', 'order_lines'):
+        # A slice of references: orders added while streaming are not included
+        orders = user_data['orders'].between(start, end)
+        rows = order_rows(orders) if dataset == 'orders' else order_line_rows(orders)
+    elif dataset == 'inventory':
+        rows = dated_rows(list(user_data['inventory']), 'date_added', start, end)
+    else:
+        # Archived entries are read from disk as the export streams
+        rows = dated_rows(user_data['history'], 'date', start, end)
+    encode = ndjson_chunks if fmt == 'ndjson' else csv_chunks
+    return encode(rows, EXPORT_COLUMNS[dataset])
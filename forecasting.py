@@ -0,0 +1,78 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+
+FORECAST_WINDOW_DAYS = 90  # Days of sales history each product's trend is fitted to
+FORECAST_CHUNK_ROWS = 5000  # Products per stacked solve when spread over a pool
+
+
+def fit_trends(series):
+    """Fit a least-squares line to every row of a products x days matrix in one stacked solve
+
+    All rows share the design matrix [1, day], so the normal equations
+    have one 2x2 Gram matrix and a column of moments per product, solved
+    together by a single np.linalg.solve. Returns per-row intercept,
+    slope and R² arrays.
+    """
+    days = series.shape[1]
+    design = np.column_stack([np.ones(days), np.arange(days)])
+    moments = series @ design  # Σy and Σxy per product
+    intercept, slope = np.linalg.solve(design.T @ design, moments.T)
+    sum_squares = np.einsum('ij,ij->i', series, series)
+    residuals = np.maximum(sum_squares - intercept * moments[:, 0] - slope * moments[:, 1], 0)
+    total = sum_squares - moments[:, 0] ** 2 / days
+    # A flat series is fitted exactly
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(total > 1e-9 * np.maximum(sum_squares, 1), 1 - residuals / total, 1.0)
+    return intercept, slope, r2
+
+
+def _forecast_rows(series, horizon):
+    intercept, slope, r2 = fit_trends(series)
+    # Future days continue the window's day numbering; negative demand is clipped per day
+    future = np.arange(series.shape[1], series.shape[1] + horizon)
+    demand = np.maximum(intercept[:, None] + slope[:, None] * future, 0).sum(axis=1)
+    return demand, slope, r2
+
+
+def forecast_matrix(series, horizon, executor=None):
+    """Forecast total demand over `horizon` days for each row; large matrices are split across executor"""
+    if executor is None or len(series) <= FORECAST_CHUNK_ROWS:
+        return _forecast_rows(series, horizon)
+    chunks = [series[start:start + FORECAST_CHUNK_ROWS] for start in range(0, len(series), FORECAST_CHUNK_ROWS)]
+    results = list(executor.map(_forecast_rows, chunks, [horizon] * len(chunks)))
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+def forecast_products(user_data, horizon=30, window=FORECAST_WINDOW_DAYS, executor=None, today=None):
+    """Forecast every product's demand over the next `horizon` days from a trend over the last `window`
+
+    Covers products sold in the window and every inventory item name;
+    products with no recent sales forecast zero. Returns rows sorted by
+    forecast demand, highest first.
+    """
+    today = today or datetime.now().date()
+    start = datetime.combine(today - timedelta(days=window - 1), time.min)
+    names, series = user_data['sales'].lines.daily_quantities(start, window)
+
+    demand = slope = r2 = np.zeros(0)
+    if len(names):
+        demand, slope, r2 = forecast_matrix(series, horizon, executor)
+
+    stock = {}
+    for item in user_data['inventory']:
+        stock[item['name']] = stock.get(item['name'], 0) + item.get('quantity', 0)
+
+    forecasts = [{
+        'name': name,
+        'forecast': forecast,
+        'daily_trend': trend,
+        'confidence': confidence,
+        'stock': stock.get(name, 0)
+    } for name, forecast, trend, confidence in zip(names, np.round(demand, 2).tolist(),
+                                                   np.round(slope, 4).tolist(), np.round(r2, 4).tolist())]
+    sold = set(names)
+    forecasts.extend({'name': name, 'forecast': 0.0, 'daily_trend': 0.0, 'confidence': 0.0, 'stock': quantity}
+                     for name, quantity in stock.items() if name not in sold)
+    forecasts.sort(key=lambda row: row['forecast'], reverse=True)
+    return forecasts
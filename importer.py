@@ -0,0 +1,141 @@
+import codecs
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+
+from store import InventoryStore
+
+IMPORT_CHUNK_SIZE = 1000  # Rows applied per bulk write
+MAX_REPORTED_ERRORS = 100  # Row errors listed in the summary; the rest are only counted
+
+
+def iter_csv(lines):
+    """Yield (row number, dict) from CSV lines with a header row"""
+    reader = csv.reader(lines)
+    header = [column.strip().lower() for column in next(reader, [])]
+    for row in reader:
+        if any(value.strip() for value in row):
+            yield reader.line_num, dict(zip(header, row))
+
+
+def iter_ndjson(lines):
+    """Yield (line number, value) from newline-delimited JSON; bad lines yield the error instead"""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, e
+
+
+def iter_rows(stream, fmt):
+    """Parse an uploaded binary stream lazily, one line at a time"""
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    return iter_ndjson(lines) if fmt == 'ndjson' else iter_csv(lines)
+
+
+def parse_item_row(row):
+    """Validate one imported row, returning the item fields add_item would use"""
+    if isinstance(row, Exception):
+        raise ValueError(f"Invalid JSON: {row}")
+    if not isinstance(row, dict):
+        raise ValueError("Expected an object")
+    name = str(row.get('name') or '').strip()
+    if not name:
+        raise ValueError("Missing name")
+    try:
+        quantity = int(row.get('quantity') or 0)
+        price = float(row.get('price') or 0)
+    except (TypeError, ValueError):
+        raise ValueError("Quantity and price must be numbers")
+    if quantity < 0 or price < 0:
+        raise ValueError("Quantity and price must not be negative")
+    return {
+        'name': name,
+        'category': str(row.get('category') or '').strip() or None,
+        'quantity': quantity,
+        'price': price,
+        'expiry_date': row.get('expiry_date') or None
+    }
+
+
+def import_items(repo, email, rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """Merge parsed rows into a user's inventory the way add_item does
+
+    Rows matching an existing item (name and category case-insensitively,
+    same price) add to its quantity; the rest become new items. Rows are
+    applied in chunks so only one chunk is held in memory at a time.
+    Returns a summary with per-row errors and the ids of touched items.
+    If the upload cannot be read to the end, the rows read so far are
+    still applied and summary['stopped'] says where and why reading ended.
+    If writing a chunk fails, the import ends there: summary['failed']
+    says why, and the counts, item ids and summary['saved_row'] cover only
+    the chunks written before it, for the caller to roll back or report.
+    """
+    user_data = repo.get_user(email)
+    inventory = user_data['inventory']
+    categories = set(user_data['categories'])
+    summary = {'rows': 0, 'added': 0, 'updated': 0, 'error_count': 0, 'errors': [], 'item_ids': set(),
+               'stopped': None, 'failed': None, 'saved_row': 0}
+    date_added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = iter(rows)
+    last_row = 0
+
+    while summary['stopped'] is None and summary['failed'] is None:
+        chunk = []
+        try:
+            chunk.extend(islice(rows, chunk_size))
+        except Exception as e:
+            # Undecodable bytes, malformed CSV or a dropped upload: nothing after this can be read
+            summary['stopped'] = f"Could not read past row {chunk[-1][0] if chunk else last_row}: {e}"
+        if not chunk:
+            break
+        first_row, last_row = chunk[0][0], chunk[-1][0]
+        new_items = {}
+        deltas = {}
+        new_categories = []
+        added = updated = 0
+        for number, row in chunk:
+            summary['rows'] += 1
+            try:
+                fields = parse_item_row(row)
+            except ValueError as e:
+                summary['error_count'] += 1
+                if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                    summary['errors'].append({'row': number, 'message': str(e)})
+                continue
+
+            key = InventoryStore.match_key(fields['name'], fields['category'], fields['price'])
+            existing_item = inventory.find_matching(fields['name'], fields['category'], fields['price'])
+            if existing_item:
+                deltas[existing_item['id']] = deltas.get(existing_item['id'], 0) + fields['quantity']
+                updated += 1
+            elif key in new_items:
+                # Merge repeats within the chunk before they are written
+                new_items[key]['quantity'] += fields['quantity']
+                updated += 1
+            else:
+                new_items[key] = dict(fields, id=inventory.next_id() + len(new_items), date_added=date_added)
+                added += 1
+            if fields['category'] and fields['category'] not in categories:
+                categories.add(fields['category'])
+                new_categories.append(fields['category'])
+
+        try:
+            repo.add_items(email, list(new_items.values()))
+            for item_id, delta in deltas.items():
+                repo.adjust_stock(email, inventory.get(item_id), delta)
+            for category in new_categories:
+                repo.add_category(email, category)
+        except Exception as e:
+            summary['failed'] = f"Could not save rows {first_row}-{last_row}: {e}"
+            break
+        summary['saved_row'] = last_row
+        summary['added'] += added
+        summary['updated'] += updated
+        summary['item_ids'].update(item['id'] for item in new_items.values())
+        summary['item_ids'].update(deltas)
+
+    return summary
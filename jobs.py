@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class JobLimitError(Exception):
+    """Raised when a job cannot be queued because a limit has been reached"""
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _run_job(directory, job_id, builder, args):
+    """Build one report on a pool thread, recording its progress in the job's status file"""
+    status_path = os.path.join(directory, f"{job_id}.json")
+    with open(status_path) as f:
+        status = json.load(f)
+    status.update(status='running', started=time.time())
+    _write_json(status_path, status)
+
+    data = builder(*args)
+    result_path = os.path.join(directory, f"{job_id}.pdf")
+    with open(result_path + ".tmp", 'wb') as f:
+        f.write(data)
+    os.replace(result_path + ".tmp", result_path)
+
+    status.update(status='done', finished=time.time(), size=len(data))
+    _write_json(status_path, status)
+
+
+class ReportJobs:
+    """Background queue that renders reports on a small thread pool
+
+    Each job's status and finished PDF are kept as files in `directory`,
+    so any worker process sharing it can answer polls and downloads. At
+    most `workers` reports render at once and at most `max_pending` wait
+    across all users; each user may have `per_user` jobs queued or running
+    in this process. Finished jobs are deleted after `ttl` seconds.
+
+    Builders get snapshots of the data taken in the request, so they
+    never read the live per-user structures while requests change them.
+    """
+
+    def __init__(self, directory, workers=2, per_user=2, max_pending=32, ttl=3600):
+        self.directory = directory
+        self.workers = workers
+        self.per_user = per_user
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = None
+        self._lock = threading.Lock()
+        self._active = {}
+        self._last_cleanup = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='report-job')
+            return self._executor
+
+    def _status_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def result_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.pdf")
+
+    def submit(self, email, filename, builder, *args):
+        """Queue builder(*args) for a user, returning the job id"""
+        self._cleanup()
+        with self._lock:
+            if self._active.get(email, 0) >= self.per_user:
+                raise JobLimitError(f"At most {self.per_user} reports can be in progress at once")
+            if sum(self._active.values()) >= self.max_pending:
+                raise JobLimitError("Too many reports are queued, please try again shortly")
+            self._active[email] = self._active.get(email, 0) + 1
+
+        job_id = uuid.uuid4().hex
+        _write_json(self._status_path(job_id), {
+            'id': job_id,
+            'user': email,
+            'status': 'queued',
+            'filename': filename,
+            'submitted': time.time()
+        })
+        try:
+            future = self._pool().submit(_run_job, self.directory, job_id, builder, args)
+        except Exception:
+            self._finish(email)
+            raise
+        future.add_done_callback(lambda future: self._done(email, job_id, future))
+        return job_id
+
+    def _finish(self, email):
+        with self._lock:
+            self._active[email] -= 1
+            if not self._active[email]:
+                del self._active[email]
+
+    def _done(self, email, job_id, future):
+        self._finish(email)
+        error = future.exception()
+        if error is not None:
+            logger.error("Report job %s failed: %s", job_id, error)
+            status = self.status(job_id, email) or {'id': job_id, 'user': email}
+            status.update(status='failed', finished=time.time(), error=str(error))
+            _write_json(self._status_path(job_id), status)
+
+    def status(self, job_id, email):
+        """Return a job's status if it exists and belongs to the user"""
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._status_path(job_id)) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return status if status.get('user') == email else None
+
+    def _cleanup(self):
+        """Delete the files of jobs that finished more than ttl seconds ago"""
+        now = time.time()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
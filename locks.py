@@ -0,0 +1,20 @@
+import threading
+
+
+class KeyedLocks:
+    """One reentrant lock per key, created on first use
+
+    Used to serialise writes per tenant: requests for the same user take
+    turns while requests for different users run concurrently.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def __call__(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault(key, threading.RLock())
+        return lock
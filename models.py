@@ -1,11 +1,137 @@
-from app import db
+from store import DATE_FORMAT, parse_order_date
 
-class Item(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    price = db.Column(db.Float, nullable=False)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    password TEXT,
+    inventory_name TEXT NOT NULL,
+    company_name TEXT NOT NULL
+);
 
-    def __repr__(self):
-        return f'<Item {self.name}>'
+CREATE TABLE IF NOT EXISTS inventory (
+    user_email TEXT NOT NULL REFERENCES users(email),
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT,
+    quantity INTEGER NOT NULL,
+    price REAL NOT NULL,
+    expiry_date TEXT,
+    date_added TEXT,
+    PRIMARY KEY (user_email, id)
+);
+CREATE INDEX IF NOT EXISTS inventory_name ON inventory (user_email, name);
 
+CREATE TABLE IF NOT EXISTS orders (
+    user_email TEXT NOT NULL REFERENCES users(email),
+    id INTEGER NOT NULL,
+    customer TEXT NOT NULL,
+    total REAL NOT NULL,
+    date TEXT NOT NULL,
+    PRIMARY KEY (user_email, id)
+);
+CREATE INDEX IF NOT EXISTS orders_date ON orders (user_email, date);
+
+CREATE TABLE IF NOT EXISTS order_lines (
+    user_email TEXT NOT NULL,
+    order_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (user_email, order_id, line),
+    FOREIGN KEY (user_email, order_id) REFERENCES orders(user_email, id)
+);
+
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_email TEXT NOT NULL REFERENCES users(email),
+    action TEXT NOT NULL,
+    item TEXT,
+    order_id INTEGER,
+    customer TEXT,
+    date TEXT NOT NULL,
+    seq INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS history_seq ON history (user_email, seq);
+
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_email TEXT NOT NULL REFERENCES users(email),
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS categories_user ON categories (user_email, id);
+
+CREATE TABLE IF NOT EXISTS stocks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_email TEXT NOT NULL REFERENCES users(email),
+    symbol TEXT NOT NULL,
+    quantity INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stocks_user ON stocks (user_email, id);
+
+CREATE TABLE IF NOT EXISTS versions (
+    user_email TEXT PRIMARY KEY REFERENCES users(email),
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS versions_version ON versions (version);
+
+-- Next order id per user, kept so ids of deleted orders are never handed out again
+CREATE TABLE IF NOT EXISTS order_ids (
+    user_email TEXT PRIMARY KEY REFERENCES users(email),
+    next_id INTEGER NOT NULL
+);
+
+-- Writes of each committed user version, replayed by other workers instead of reloading the user
+CREATE TABLE IF NOT EXISTS change_log (
+    version INTEGER PRIMARY KEY,
+    user_email TEXT NOT NULL,
+    previous INTEGER NOT NULL,
+    ops BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS change_log_user ON change_log (user_email, version);
+"""
+
+INVENTORY_COLUMNS = ('id', 'name', 'category', 'quantity', 'price', 'expiry_date', 'date_added')
+HISTORY_COLUMNS = ('action', 'item', 'order_id', 'customer', 'date')
+
+
+def item_to_row(email, item):
+    return (email,) + tuple(item.get(column) for column in INVENTORY_COLUMNS)
+
+
+def item_from_row(row):
+    return {column: row[column] for column in INVENTORY_COLUMNS}
+
+
+def order_to_row(email, order):
+    return (email, order['id'], order['customer'], order['total'],
+            parse_order_date(order['date']).strftime(DATE_FORMAT))
+
+
+def order_lines_to_rows(email, order):
+    return [(email, order['id'], line, item['name'], item['quantity'], item['price'])
+            for line, item in enumerate(order['items'])]
+
+
+def order_from_row(row, items):
+    return {
+        'id': row['id'],
+        'customer': row['customer'],
+        'items': items,
+        'total': row['total'],
+        'date': parse_order_date(row['date'])
+    }
+
+
+def line_from_row(row):
+    return {'name': row['name'], 'quantity': row['quantity'], 'price': row['price']}
+
+
+def history_to_row(email, entry):
+    return (email,) + tuple(entry.get(column) for column in HISTORY_COLUMNS)
+
+
+def history_from_row(row):
+    # Only keep the keys the entry was written with, as history.html tests them
+    return {column: row[column] for column in HISTORY_COLUMNS if row[column] is not None}
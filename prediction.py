@@ -1,37 +1,43 @@
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
 import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date as Date, datetime, timedelta
 import random
+from store import parse_order_date
+
+def daily_totals(orders):
+    """Sum order totals per day, returning the days with orders (as ordinals) and their totals"""
+    days = np.fromiter((parse_order_date(order['date']).toordinal() for order in orders), dtype=np.int64)
+    totals = np.fromiter((float(order.get('total', 0)) for order in orders), dtype=np.float64)
+    if not len(days):
+        return days, totals
+
+    # Bucket by offset from the first day; days without orders are dropped
+    first_day = days.min()
+    offsets = days - first_day
+    present = np.flatnonzero(np.bincount(offsets))
+    return present + first_day, np.bincount(offsets, weights=totals)[present]
 
 class SalesPrediction:
     def __init__(self):
         self.model = LinearRegression()
         self.is_trained = False
         self.first_date = None
+        self.X = None
+        self.y = None
     
     def prepare_data(self, orders):
         """Prepare historical sales data from orders"""
-        daily_sales = {}
-        
-        for order in orders:
-            date = datetime.strptime(order['date'], "%Y-%m-%d %H:%M:%S").date()
-            if date not in daily_sales:
-                daily_sales[date] = 0
-            daily_sales[date] += float(order.get('total', 0))
+        days, totals = daily_totals(orders)
         
-        # Sort by date
-        sorted_dates = sorted(daily_sales.keys())
-        
-        if len(sorted_dates) < 5:  # Need minimum data points
+        if len(days) < 5:  # Need minimum data points
             return None, None
         
-        self.first_date = sorted_dates[0]
+        self.first_date = Date.fromordinal(int(days[0]))
         
-        # Convert to arrays
-        X = np.array([(date - self.first_date).days for date in sorted_dates]).reshape(-1, 1)
-        y = np.array([daily_sales[date] for date in sorted_dates])
+        # Day offsets as the single feature column
+        X = (days - days[0]).reshape(-1, 1)
+        y = totals
         
         return X, y
     
@@ -44,6 +50,8 @@ class SalesPrediction:
             return False
         
         self.model.fit(X, y)
+        # Keep the matrices so scoring does not prepare them again
+        self.X, self.y = X, y
         self.is_trained = True
         return True
     
@@ -63,8 +71,8 @@ class SalesPrediction:
         predictions = self.model.predict(future_X)
         predictions = [max(0, p) for p in predictions]  # Ensure no negative predictions
         
-        # Calculate confidence (R² score)
-        confidence = self.model.score(*self.prepare_data(orders))
+        # Calculate confidence (R² score) on the training data
+        confidence = self.model.score(self.X, self.y)
         
         return future_dates, predictions, confidence
     
@@ -103,6 +111,40 @@ class SalesPrediction:
         prediction_data = self.get_prediction_data(sample_orders)
         return prediction_data, sample_orders
 
+class OnlineSalesPrediction:
+    """Sales forecast solved from a user's running DailyTrend sums instead of their orders
+
+    Fits the same line as SalesPrediction in O(1), however long the order
+    history; the sums are kept up to date as orders change.
+    """
+    def __init__(self, trend):
+        fit = trend.fit()
+        self.is_trained = fit is not None
+        if self.is_trained:
+            self.origin, self.slope, self.intercept, self.confidence = fit
+    
+    def get_prediction_data(self, days_to_predict=30):
+        """Get formatted prediction data for the frontend"""
+        if not self.is_trained:
+            return {
+                'labels': [],
+                'data': [],
+                'confidence': 0,
+                'error': 'Insufficient data (minimum 5 days required)'
+            }
+        
+        last_date = datetime.now().date()
+        future_dates = [last_date + timedelta(days=x+1) for x in range(days_to_predict)]
+        predictions = [max(0, self.intercept + self.slope * (date.toordinal() - self.origin))
+                       for date in future_dates]
+        
+        return {
+            'labels': [date.strftime("%Y-%m-%d") for date in future_dates],
+            'data': [round(pred, 2) for pred in predictions],
+            'confidence': self.confidence,
+            'error': None
+        }
+
 def get_sales_insights(orders):
     """Get additional sales insights"""
     if not orders:
@@ -113,14 +155,9 @@ def get_sales_insights(orders):
             'peak_amount': 0
         }
     
-    daily_sales = {}
-    for order in orders:
-        date = datetime.strptime(order['date'], "%Y-%m-%d %H:%M:%S").date()
-        if date not in daily_sales:
-            daily_sales[date] = 0
-        daily_sales[date] += float(order.get('total', 0))
+    days, totals = daily_totals(orders)
     
-    if not daily_sales:
+    if not len(days):
         return {
             'trend': 'neutral',
             'avg_daily_sales': 0,
@@ -129,18 +166,16 @@ def get_sales_insights(orders):
         }
     
     # Calculate insights
-    peak_day = max(daily_sales.items(), key=lambda x: x[1])
-    avg_daily_sales = sum(daily_sales.values()) / len(daily_sales)
+    peak = int(np.argmax(totals))
+    avg_daily_sales = float(totals.mean())
     
     # Determine trend
-    dates = sorted(daily_sales.keys())
-    if len(dates) >= 2:
-        recent_avg = daily_sales[dates[-1]]
-        if len(dates) >= 7:
-            recent_avg = sum(daily_sales[date] for date in dates[-7:]) / 7
-        old_avg = daily_sales[dates[0]]
-        if len(dates) >= 7:
-            old_avg = sum(daily_sales[date] for date in dates[:7]) / 7
+    if len(days) >= 2:
+        recent_avg = totals[-1]
+        old_avg = totals[0]
+        if len(days) >= 7:
+            recent_avg = totals[-7:].sum() / 7
+            old_avg = totals[:7].sum() / 7
         
         trend = 'up' if recent_avg > old_avg else 'down' if recent_avg < old_avg else 'neutral'
     else:
@@ -149,8 +184,8 @@ def get_sales_insights(orders):
     return {
         'trend': trend,
         'avg_daily_sales': round(avg_daily_sales, 2),
-        'peak_day': peak_day[0].strftime("%Y-%m-%d"),
-        'peak_amount': round(peak_day[1], 2)
+        'peak_day': Date.fromordinal(int(days[peak])).strftime("%Y-%m-%d"),
+        'peak_amount': round(float(totals[peak]), 2)
     }
 
 def generate_sample_data():
@@ -205,7 +240,7 @@ def generate_sample_data():
             order_time = current_date + timedelta(hours=random.randint(9, 20))
             
             order = {
-                'date': order_time.strftime("%Y-%m-%d %H:%M:%S"),
+                'date': order_time.replace(microsecond=0),
                 'items': order_items,
                 'total': order_total,
                 'customer': f"Customer{random.randint(1, 100)}"
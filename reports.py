@@ -0,0 +1,245 @@
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from store import format_order_date
+
+
+def build_summary_report(company_name, total_revenue, total_orders, sorted_products, recent_orders, current_date):
+    """Render the dashboard summary report, returning the PDF bytes"""
+    # Create a PDF buffer
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elements = []
+    
+    # Styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        alignment=1  # Center alignment
+    )
+    
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Heading2'],
+        fontSize=16,
+        spaceAfter=20,
+        textColor=colors.HexColor('#666666')
+    )
+    
+    # Add company name and report title
+    elements.append(Paragraph(company_name or 'Company Name', title_style))
+    elements.append(Paragraph('Report', subtitle_style))
+    
+    # Add date range
+    date_text = f"Generated on: {current_date}"
+    elements.append(Paragraph(date_text, styles['Normal']))
+    elements.append(Spacer(1, 20))
+    
+    # Sales Summary Table
+    summary_data = [
+        ['Sales Summary', ''],
+        ['Total Revenue', f"₹{total_revenue:,.2f}"],
+        ['Total Orders', str(total_orders)],
+        ['Average Order Value', f"₹{(total_revenue/total_orders if total_orders > 0 else 0):,.2f}"]
+    ]
+    
+    summary_table = Table(summary_data, colWidths=[200, 200])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8f9fa')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#666666')),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('TOPPADDING', (0, 0), (-1, 0), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dee2e6')),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 12),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+        ('TOPPADDING', (0, 1), (-1, -1), 8),
+    ]))
+    elements.append(summary_table)
+    elements.append(Spacer(1, 30))
+    
+    # Product Sales Table
+    elements.append(Paragraph('Product-wise Sales', subtitle_style))
+    
+    product_data = [['Product Name', 'Quantity Sold', 'Revenue']]
+    for data in sorted_products:
+        product_data.append([
+            data['name'],
+            str(data['quantity']),
+            f"₹{data['revenue']:,.2f}"
+        ])
+    
+    product_table = Table(product_data, colWidths=[200, 100, 100])
+    product_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f8f9fa')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#666666')),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#dee2e6')),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+        ('TOPPADDING', (0, 1), (-1, -1), 8),
+    ]))
+    elements.append(product_table)
+    elements.append(Spacer(1, 30))
+    
+    # Recent Orders Table
+    elements.append(Paragraph('Recent Orders', subtitle_style))
+    
+    # Prepare data for table
+    table_data = [['Order ID', 'Customer', 'Items', 'Total', 'Date']]
+    
+    for i, order in enumerate(recent_orders, 1):
+        # Format items vertically, one per line
+        items_str = "\n".join([f"{item['name']} (x{item['quantity']})" for item in order['items']])
+        
+        table_data.append([
+            f"#{i:04d}",
+            order['customer'],
+            items_str,
+            f"₹{order['total']:,.2f}",
+            format_order_date(order['date'])
+        ])
+    
+    # Create table with properly imported inch unit
+    table = Table(table_data, colWidths=[0.7*inch, 1.5*inch, 2.5*inch, 1*inch, 1.3*inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('ALIGN', (2, 1), (2, -1), 'LEFT'),  # Left align items column
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),  # Align all content to top
+        ('TOPPADDING', (0, 1), (-1, -1), 12),  # Add padding to cells
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 12),
+    ]))
+    elements.append(table)
+    
+    # Build PDF
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def build_sales_report(company_name, orders, view=None, report_type=None, date=None, start_date=None, end_date=None,
+                       product_totals=None):
+    """Render a sales report over the given orders (newest first), returning the PDF bytes
+
+    The product view lists product_totals, as returned by OrderLines.product_totals().
+    """
+    # Create PDF
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    elements = []
+
+    # Styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30
+    )
+
+    # Add title and date info
+    elements.append(Paragraph(f"Sales Report - {company_name or 'Company'}", title_style))
+    elements.append(Spacer(1, 12))
+
+    if report_type == 'range':
+        date_info = f"Period: {start_date} to {end_date}"
+    elif view == 'today':
+        date_info = f"Date: {date}"
+    else:
+        date_info = "Overall Sales Report"
+    elements.append(Paragraph(date_info, styles["Normal"]))
+    elements.append(Spacer(1, 20))
+
+    # Prepare data
+    if view == 'product':
+        # Product-wise summary with date range info (orders are newest first)
+        if orders:
+            elements.append(Paragraph(
+                f"Period: {orders[-1]['date'].strftime('%Y-%m-%d')} to {orders[0]['date'].strftime('%Y-%m-%d')}", 
+                styles["Normal"]
+            ))
+            elements.append(Spacer(1, 12))
+
+        table_data = [['Product', 'Quantity Sold', 'Revenue']]
+        for data in product_totals:
+            table_data.append([
+                data['name'],
+                str(data['quantity']),
+                f"₹{data['revenue']:,.2f}"
+            ])
+    else:
+        # Order-wise details
+        table_data = [['Order ID', 'Date & Time', 'Customer', 'Items', 'Total']]
+        for i, order in enumerate(orders, 1):
+            items_str = "\n".join([f"{item['name']} (x{item['quantity']})" for item in order['items']])
+            # Format the date for better readability
+            formatted_date = order['date'].strftime("%Y-%m-%d %I:%M %p")
+            
+            table_data.append([
+                f"#{i:05d}",
+                formatted_date,
+                order['customer'],
+                items_str,
+                f"₹{order['total']:,.2f}"
+            ])
+
+    # Create table with adjusted column widths
+    if view == 'product':
+        col_widths = [250, 100, 150]  # Adjusted for product view
+    else:
+        col_widths = [60, 120, 100, 200, 80]  # Adjusted for order view
+    
+    table = Table(table_data, repeatRows=1, colWidths=col_widths)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        # Align specific columns
+        ('ALIGN', (3, 1), (3, -1), 'LEFT'),  # Items column left-aligned
+        ('ALIGN', (-1, 1), (-1, -1), 'RIGHT'),  # Total column right-aligned
+    ]))
+    elements.append(table)
+    elements.append(Spacer(1, 20))
+
+    # Add summary
+    total_sales = sum(order['total'] for order in orders)
+    elements.append(Paragraph(f"Total Sales: ₹{total_sales:,.2f}", styles["Heading3"]))
+    elements.append(Paragraph(f"Number of Orders: {len(orders)}", styles["Normal"]))
+
+    # Generate PDF
+    doc.build(elements)
+    return buffer.getvalue()
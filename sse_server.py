@@ -0,0 +1,270 @@
+import asyncio
+import json
+import logging
+import socket
+import threading
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(data):
+    return f"data: {json.dumps(data)}\n\n".encode()
+
+
+HEARTBEAT = b": keep-alive\n\n"
+
+
+class SSEClient:
+    """One open /stream connection and its bounded queue of pending messages"""
+
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def send(self, message):
+        """Queue a message, returning False if the client has fallen too far behind"""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def reset(self, message):
+        """Drop everything pending and queue a single message in its place"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+class UserChannel:
+    """The stream state last broadcast to one user's clients"""
+
+    def __init__(self, counts, low_stock):
+        self.counts = counts
+        self.low_stock = low_stock
+        self.clients = set()
+        self.lock = asyncio.Lock()  # Held while a delta updates counts and low_stock
+
+    def snapshot(self):
+        return format_event(dict(self.counts, event='update',
+                                 low_stock_products=list(self.low_stock.values())))
+
+
+class SSEServer:
+    """Asyncio server-sent events endpoint that runs beside the Flask app
+
+    Every open dashboard costs one socket and a small queue instead of a
+    worker thread. Changes published on the ChangeBus are diffed once per
+    user and fanned out to all of that user's connections. A client whose
+    queue fills up (a slow reader) has its backlog replaced by one full
+    snapshot rather than growing without bound. Holding 10k+ connections
+    needs the open file limit raised accordingly (ulimit -n).
+
+    snapshot and delta read the user's data, so they run in the loop's
+    default executor rather than on the loop itself. Cross-origin requests
+    get CORS headers only from `allowed_origins`, or when that is empty,
+    from pages on the same host as the server (the app on another port).
+    """
+
+    def __init__(self, app, changes, snapshot, delta, heartbeat=15, queue_size=16, allowed_origins=()):
+        self.app = app
+        self.changes = changes
+        self.snapshot = snapshot
+        self.delta = delta
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+        self.allowed_origins = set(allowed_origins)
+        self.loop = None
+        self.channels = {}
+        self._opening = {}  # email -> task building the first snapshot of a new channel
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self, host, port):
+        """Serve in a background thread; later calls are no-ops"""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        thread = threading.Thread(target=asyncio.run, args=(self.serve(host, port),),
+                                  name='sse-server', daemon=True)
+        thread.start()
+
+    async def serve(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        self.changes.add_listener(self._on_change)
+        # Every gunicorn worker binds the port; the kernel spreads connections between them
+        server = await asyncio.start_server(self._handle, host, port, backlog=4096,
+                                            reuse_port=hasattr(socket, 'SO_REUSEPORT'))
+        logger.info("SSE server listening on %s:%s", host, port)
+        heartbeat = asyncio.ensure_future(self._heartbeat())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            heartbeat.cancel()
+
+    def connection_count(self):
+        return sum(len(channel.clients) for channel in self.channels.values())
+
+    def _on_change(self, email, version, item_ids):
+        # Called from the publishing (request) thread
+        if self.loop is not None and email in self.channels:
+            asyncio.run_coroutine_threadsafe(
+                self._broadcast(email, set(item_ids) if item_ids is not None else None), self.loop)
+
+    async def _broadcast(self, email, item_ids):
+        channel = self.channels.get(email)
+        if channel is None:
+            return
+        async with channel.lock:
+            try:
+                data = await self.loop.run_in_executor(None, self.delta, email, channel.counts,
+                                                       channel.low_stock, item_ids)
+            except Exception as e:
+                logger.warning("SSE delta for %s failed: %s", email, e)
+                return
+            if not data:
+                return
+            message = format_event(data)
+            snapshot = None
+            for client in channel.clients:
+                if not client.send(message):
+                    # Slow client: coalesce its backlog into one snapshot
+                    if snapshot is None:
+                        snapshot = channel.snapshot()
+                    client.reset(snapshot)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for channel in list(self.channels.values()):
+                for client in channel.clients:
+                    if client.queue.empty():
+                        client.send(HEARTBEAT)
+
+    def _authenticate(self, cookie_header):
+        """Return the logged-in user's email from the Flask session cookie"""
+        if not cookie_header:
+            return None
+        cookie = SimpleCookie()
+        cookie.load(cookie_header)
+        morsel = cookie.get(self.app.config['SESSION_COOKIE_NAME'])
+        serializer = self.app.session_interface.get_signing_serializer(self.app)
+        if morsel is None or serializer is None:
+            return None
+        try:
+            session = serializer.loads(
+                morsel.value,
+                max_age=int(self.app.permanent_session_lifetime.total_seconds()))
+        except Exception:
+            return None
+        return session.get('user_email')
+
+    async def _read_request(self, reader):
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=10)
+        lines = head.decode('latin-1').split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        return method, target.split("?", 1)[0], headers
+
+    def _cors_headers(self, origin, host):
+        """CORS headers for an allowed origin; none for any other site, so it cannot read the stream"""
+        if not origin:
+            return ""
+        if self.allowed_origins:
+            allowed = origin in self.allowed_origins
+        else:
+            allowed = urlsplit(origin).hostname == urlsplit(f"//{host}").hostname
+        if not allowed:
+            return ""
+        return (f"Access-Control-Allow-Origin: {origin}\r\n"
+                "Access-Control-Allow-Credentials: true\r\n"
+                "Vary: Origin\r\n")
+
+    async def _handle(self, reader, writer):
+        try:
+            method, path, headers = await self._read_request(reader)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            writer.close()
+            return
+
+        cors = self._cors_headers(headers.get('origin'), headers.get('host', ''))
+
+        if method != 'GET' or path != '/stream':
+            writer.write(f"HTTP/1.1 404 Not Found\r\n{cors}Content-Length: 0\r\nConnection: close\r\n\r\n".encode())
+            await self._close(writer)
+            return
+
+        email = self._authenticate(headers.get('cookie'))
+        if not email:
+            writer.write(f"HTTP/1.1 401 Unauthorized\r\n{cors}Content-Length: 0\r\nConnection: close\r\n\r\n".encode())
+            await self._close(writer)
+            return
+
+        try:
+            channel = await self._join(email)
+        except KeyError:
+            writer.write(f"HTTP/1.1 401 Unauthorized\r\n{cors}Content-Length: 0\r\nConnection: close\r\n\r\n".encode())
+            await self._close(writer)
+            return
+
+        client = SSEClient(writer, self.queue_size)
+        channel.clients.add(client)
+        writer.write(("HTTP/1.1 200 OK\r\n"
+                      "Content-Type: text/event-stream\r\n"
+                      "Cache-Control: no-cache\r\n"
+                      "X-Accel-Buffering: no\r\n"
+                      f"{cors}"
+                      "Connection: keep-alive\r\n\r\n").encode())
+        async with channel.lock:
+            client.send(channel.snapshot())
+        try:
+            while True:
+                writer.write(await client.queue.get())
+                # Blocks while the socket buffer is full; new messages
+                # meanwhile pile up in the bounded queue
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            channel.clients.discard(client)
+            if not channel.clients and self.channels.get(email) is channel:
+                del self.channels[email]
+            await self._close(writer)
+
+    async def _join(self, email):
+        """Return the user's channel; concurrent first connections share one snapshot"""
+        channel = self.channels.get(email)
+        if channel is None:
+            opening = self._opening.get(email)
+            if opening is None:
+                opening = self._opening[email] = self.loop.create_task(self._open(email))
+            # Shielded so one client disconnecting does not cancel it for the others
+            channel = await asyncio.shield(opening)
+        return channel
+
+    async def _open(self, email):
+        try:
+            version = self.changes.version(email)
+            counts, low_stock = await self.loop.run_in_executor(None, self.snapshot, email)
+            channel = self.channels[email] = UserChannel(counts, low_stock)
+        finally:
+            del self._opening[email]
+        if self.changes.version(email) != version:
+            # A change published while the snapshot was built was not broadcast to this channel
+            self.loop.create_task(self._broadcast(email, None))
+        return channel
+
+    async def _close(self, writer):
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
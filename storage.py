@@ -0,0 +1,831 @@
+import glob
+import logging
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import zlib
+import hashlib
+from contextlib import nullcontext
+
+from models import (SCHEMA, item_to_row, item_from_row, order_to_row, order_lines_to_rows,
+                    order_from_row, line_from_row, history_to_row, history_from_row)
+from archive import HistoryArchive
+from store import HISTORY_CAPACITY, HistoryLog, InventoryStore, OrderLog, SalesAggregates
+
+logger = logging.getLogger(__name__)
+
+INSERT_USER = """INSERT INTO users (email, username, password, inventory_name, company_name)
+                 VALUES (?, ?, ?, ?, ?)"""
+UPDATE_USER = "UPDATE users SET {} WHERE email = ?"
+SELECT_USER = "SELECT * FROM users WHERE email = ?"
+
+INSERT_ITEM = """INSERT INTO inventory (user_email, id, name, category, quantity, price, expiry_date, date_added)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+UPDATE_ITEM = """UPDATE inventory SET name = ?, category = ?, quantity = ?, price = ?, expiry_date = ?
+                 WHERE user_email = ? AND id = ?"""
+UPDATE_ITEM_QUANTITY = "UPDATE inventory SET quantity = ? WHERE user_email = ? AND id = ?"
+DELETE_ITEM = "DELETE FROM inventory WHERE user_email = ? AND id = ?"
+SELECT_INVENTORY = "SELECT * FROM inventory WHERE user_email = ? ORDER BY id"
+
+INSERT_ORDER = "INSERT INTO orders (user_email, id, customer, total, date) VALUES (?, ?, ?, ?, ?)"
+DELETE_ORDER = "DELETE FROM orders WHERE user_email = ? AND id = ?"
+SELECT_ORDERS = "SELECT * FROM orders WHERE user_email = ? ORDER BY date, id"
+INSERT_ORDER_LINE = """INSERT INTO order_lines (user_email, order_id, line, name, quantity, price)
+                       VALUES (?, ?, ?, ?, ?, ?)"""
+DELETE_ORDER_LINES = "DELETE FROM order_lines WHERE user_email = ? AND order_id = ?"
+SELECT_ORDER_LINES = "SELECT * FROM order_lines WHERE user_email = ? ORDER BY order_id, line"
+SAVE_NEXT_ORDER_ID = """INSERT INTO order_ids (user_email, next_id) VALUES (?, ?)
+                        ON CONFLICT (user_email) DO UPDATE SET next_id = MAX(next_id, excluded.next_id)"""
+SELECT_NEXT_ORDER_ID = "SELECT next_id FROM order_ids WHERE user_email = ?"
+
+# seq numbers each user's entries from 0, so the archive can page by key instead of OFFSET
+INSERT_HISTORY = """INSERT INTO history (user_email, action, item, order_id, customer, date, seq)
+                    SELECT ?1, ?2, ?3, ?4, ?5, ?6, COALESCE(MAX(seq) + 1, 0) FROM history WHERE user_email = ?1"""
+SELECT_HISTORY_FROM = "SELECT * FROM history WHERE user_email = ? AND seq >= ? ORDER BY seq LIMIT ?"
+SELECT_HISTORY_BEFORE = "SELECT * FROM history WHERE user_email = ? AND seq < ? ORDER BY seq DESC LIMIT ?"
+SELECT_RECENT_HISTORY = """SELECT * FROM (SELECT * FROM history WHERE user_email = ? ORDER BY seq DESC LIMIT ?)
+                           ORDER BY seq"""
+COUNT_HISTORY = "SELECT COALESCE(MAX(seq) + 1, 0) FROM history WHERE user_email = ?"
+# Numbers the history of databases created before the seq column existed
+NUMBER_HISTORY = """UPDATE history SET seq = numbered.seq
+                    FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY user_email ORDER BY id) - 1 AS seq
+                          FROM history) AS numbered
+                    WHERE history.id = numbered.id"""
+
+INSERT_CATEGORY = "INSERT INTO categories (user_email, name) VALUES (?, ?)"
+SELECT_CATEGORIES = "SELECT name FROM categories WHERE user_email = ? ORDER BY id"
+
+INSERT_STOCK = "INSERT INTO stocks (user_email, symbol, quantity) VALUES (?, ?, ?)"
+SELECT_STOCKS = "SELECT symbol, quantity FROM stocks WHERE user_email = ? ORDER BY id"
+
+# Versions come from one sequence shared by all users, so pollers can ask what changed since N
+BUMP_VERSION = """INSERT INTO versions (user_email, version)
+                  VALUES (?, (SELECT COALESCE(MAX(version), 0) + 1 FROM versions))
+                  ON CONFLICT (user_email) DO UPDATE SET version = excluded.version"""
+SELECT_VERSION = "SELECT version FROM versions WHERE user_email = ?"
+SELECT_LATEST_VERSION = "SELECT COALESCE(MAX(version), 0) FROM versions"
+SELECT_CHANGED = "SELECT user_email, version FROM versions WHERE version > ? ORDER BY version"
+
+INSERT_CHANGE = "INSERT INTO change_log (version, user_email, previous, ops) VALUES (?, ?, ?, ?)"
+SELECT_CHANGES = "SELECT * FROM change_log WHERE user_email = ? AND version > ? ORDER BY version"
+PRUNE_CHANGES = "DELETE FROM change_log WHERE version <= ?"
+CHANGE_LOG_LENGTH = 10000  # Commits kept in change_log; a worker further behind reloads the user in full
+
+SETTINGS = ('inventory_name', 'company_name')
+
+
+def new_user_data(username, password, history=None):
+    return {
+        'username': username,
+        'password': password,
+        'inventory': InventoryStore(),
+        'inventory_name': 'Inventory System',
+        'company_name': 'Inventory Dashboard',
+        'orders': OrderLog(),
+        'sales': SalesAggregates(),
+        'history': history if history is not None else HistoryLog(),
+        'categories': [],
+        'stocks': []
+    }
+
+
+class Repository:
+    """In-memory user data that every write goes through
+
+    Reads are served from `users`, which holds the indexed structures the
+    routes read directly (InventoryStore, OrderLog, SalesAggregates). Each
+    write method updates that model and then hands the change to
+    _record(), which the storage backends implement. commit() is called
+    once at the end of every request.
+    """
+
+    can_rollback = False  # Whether rollback() discards uncommitted writes rather than keeping them
+
+    def __init__(self):
+        self.users = {}
+
+    def _mutation(self):
+        """Context held around each in-memory update and its record"""
+        return nullcontext()
+
+    def _record(self, op, email, *args):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _history_archive(self, email):
+        """Where a user's history goes once it falls out of memory; None keeps all of it in memory"""
+        return None
+
+    @staticmethod
+    def _reference_args(op, args):
+        """Args of a write with references to existing objects replaced by their ids, so replay can find them"""
+        if op == 'adjust_stock':
+            return (args[0]['id'], args[1])
+        if op == 'replace_order':
+            return (args[0]['id'], args[1])
+        if op == 'delete_order':
+            return (args[0]['id'],)
+        return args
+
+    def _replay(self, op, email, args):
+        """Apply a write recorded by _record() with _reference_args() to the in-memory model"""
+        user_data = self.users.get(email)
+        if op == 'update_settings':
+            self.update_settings(email, **args[0])
+        elif op == 'update_item':
+            item = args[0]
+            self.update_item(email, item['id'], **{k: v for k, v in item.items() if k != 'id'})
+        elif op == 'adjust_stock':
+            self.adjust_stock(email, user_data['inventory'].get(args[0]), args[1])
+        elif op == 'replace_order':
+            self.replace_order(email, user_data['orders'].get(args[0]), args[1])
+        elif op == 'delete_order':
+            self.delete_order(email, user_data['orders'].get(args[0]))
+        else:
+            getattr(self, op)(email, *args)
+
+    # Users
+
+    def get_user(self, email):
+        return self.users.get(email)
+
+    def create_user(self, email, username, password):
+        with self._mutation():
+            history = HistoryLog(archive=self._history_archive(email))
+            user_data = self.users[email] = new_user_data(username, password, history)
+            self._record('create_user', email, username, password)
+        return user_data
+
+    def update_settings(self, email, **fields):
+        """Update user-level settings such as company_name and inventory_name"""
+        unknown = set(fields) - set(SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        with self._mutation():
+            self.users[email].update(fields)
+            self._record('update_settings', email, fields)
+
+    # Inventory
+
+    def add_item(self, email, item):
+        with self._mutation():
+            self.users[email]['inventory'].add(item)
+            self._record('add_item', email, item)
+        return item
+
+    def add_items(self, email, items):
+        """Add a batch of new items as one write"""
+        with self._mutation():
+            self.users[email]['inventory'].add_many(items)
+            self._record('add_items', email, items)
+        return items
+
+    def update_item(self, email, item_id, **fields):
+        with self._mutation():
+            item = self.users[email]['inventory'].update(item_id, **fields)
+            if item is not None:
+                self._record('update_item', email, item)
+        return item
+
+    def adjust_stock(self, email, item, delta):
+        """Change an item's stock level by delta"""
+        with self._mutation():
+            self.users[email]['inventory'].adjust_quantity(item, delta)
+            self._record('adjust_stock', email, item, delta)
+        return item
+
+    def delete_item(self, email, item_id):
+        with self._mutation():
+            item = self.users[email]['inventory'].remove(item_id)
+            if item is not None:
+                self._record('delete_item', email, item_id)
+        return item
+
+    def add_category(self, email, category):
+        with self._mutation():
+            self.users[email]['categories'].append(category)
+            self._record('add_category', email, category)
+
+    def add_stock(self, email, stock):
+        with self._mutation():
+            self.users[email]['stocks'].append(stock)
+            self._record('add_stock', email, stock)
+
+    # Orders
+
+    def add_order(self, email, order):
+        with self._mutation():
+            user_data = self.users[email]
+            user_data['orders'].add(order)
+            user_data['sales'].record(order)
+            self._record('add_order', email, order)
+        return order
+
+    def replace_order(self, email, old_order, new_order):
+        with self._mutation():
+            user_data = self.users[email]
+            user_data['orders'].replace(old_order, new_order)
+            user_data['sales'].retract(old_order)
+            user_data['sales'].record(new_order)
+            self._record('replace_order', email, old_order, new_order)
+        return new_order
+
+    def add_orders(self, email, orders):
+        """Add a batch of orders as one write"""
+        with self._mutation():
+            user_data = self.users[email]
+            for order in orders:
+                user_data['orders'].add(order)
+                user_data['sales'].record(order)
+            self._record('add_orders', email, orders)
+        return orders
+
+    def delete_order(self, email, order):
+        with self._mutation():
+            user_data = self.users[email]
+            user_data['orders'].remove(order)
+            user_data['sales'].retract(order)
+            self._record('delete_order', email, order)
+        return order
+
+    # History
+
+    def add_history(self, email, entry):
+        with self._mutation():
+            self.users[email]['history'].append(entry)
+            self._record('add_history', email, entry)
+        return entry
+
+    def add_history_entries(self, email, entries):
+        with self._mutation():
+            self.users[email]['history'].extend(entries)
+            self._record('add_history_entries', email, entries)
+        return entries
+
+
+class SQLiteRepository(Repository):
+    """Repository persisted to SQLite, loading each user lazily on first access
+
+    Runs in WAL mode with one reused connection per thread. Writes use a
+    fixed set of parameterised statements, so sqlite3's statement cache
+    reuses them. They stay in the thread's open transaction until
+    commit(), which also bumps the version of every user written.
+
+    With shared=True several processes (gunicorn workers) can use the same
+    database. Each commit also stores the writes it made to each user in
+    change_log, chained by version. get_user() compares the cached user's
+    version with the stored one and, if another process has committed
+    since, replays those writes on the cached copy; it reloads the user in
+    full only when the log no longer reaches back to the cached version.
+    begin_write() takes the database write lock up front so a write
+    request works on current data.
+    """
+
+    can_rollback = True
+
+    def __init__(self, path, shared=False):
+        super().__init__()
+        self.path = path
+        self.shared = shared
+        self._local = threading.local()
+        self._load_lock = threading.Lock()
+        self._connections = []
+        self._versions = {}
+        conn = self._connect()
+        self._number_history(conn)
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    @staticmethod
+    def _number_history(conn):
+        """Add and fill the history seq column in a database created without it"""
+        conn.execute("BEGIN IMMEDIATE")  # Other workers may be starting on the same file
+        columns = [column['name'] for column in conn.execute("PRAGMA table_info(history)")]
+        if columns and 'seq' not in columns:
+            conn.execute("ALTER TABLE history ADD COLUMN seq INTEGER")
+            conn.execute(NUMBER_HISTORY)
+        conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @property
+    def connection(self):
+        """The calling thread's connection, opened on first use"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = self._local.connection = self._connect()
+            self._connections.append(conn)
+        return conn
+
+    def _dirty(self):
+        """Emails of the users written in this thread's open transaction"""
+        dirty = getattr(self._local, 'dirty', None)
+        if dirty is None:
+            dirty = self._local.dirty = set()
+        return dirty
+
+    def _pending(self):
+        """Pickled writes per user in this thread's open transaction, for change_log"""
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            pending = self._local.pending = {}
+        return pending
+
+    def begin_write(self):
+        """Take the database write lock before reading the data a write depends on"""
+        if self.shared and not self.connection.in_transaction:
+            self.connection.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        conn = getattr(self._local, 'connection', None)
+        dirty = self._dirty()
+        pending = self._pending()
+        if conn is not None and conn.in_transaction:
+            versions = {}
+            for email in dirty:
+                previous = self._stored_version(email)
+                conn.execute(BUMP_VERSION, (email,))
+                versions[email] = conn.execute(SELECT_VERSION, (email,)).fetchone()[0]
+                if self.shared:
+                    conn.execute(INSERT_CHANGE, (versions[email], email, previous,
+                                                 pickle.dumps(pending.get(email, []), protocol=pickle.HIGHEST_PROTOCOL)))
+            if self.shared and versions:
+                conn.execute(PRUNE_CHANGES, (max(versions.values()) - CHANGE_LOG_LENGTH,))
+            # Another thread must not see the new stored versions before our copies are marked
+            # current, or it would catch up by replaying these writes a second time
+            with self._load_lock:
+                conn.commit()
+                self._versions.update(versions)
+        dirty.clear()
+        pending.clear()
+
+    def rollback(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+        # The in-memory copies already hold the discarded writes; reload them
+        dirty = self._dirty()
+        for email in dirty:
+            self.users.pop(email, None)
+        dirty.clear()
+        self._pending().clear()
+
+    def close(self):
+        for conn in self._connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass  # Owned by a thread that has already exited
+        self._connections.clear()
+
+    def get_user(self, email):
+        """Return a user's data, loading it from the database on first access"""
+        user_data = self.users.get(email)
+        if user_data is not None and not self._is_stale(email):
+            return user_data
+        with self._load_lock:
+            user_data = self.users.get(email)
+            if user_data is None or (self._is_stale(email) and not self._catch_up(email)):
+                user_data = self._load_user(email)
+                if user_data is not None:
+                    self.users[email] = user_data
+        return user_data
+
+    def _stored_version(self, email):
+        row = self.connection.execute(SELECT_VERSION, (email,)).fetchone()
+        return row[0] if row else 0
+
+    def _is_stale(self, email):
+        """Whether another process has changed a cached user since it was loaded"""
+        return self.shared and self._versions.get(email) != self._stored_version(email)
+
+    def _catch_up(self, email):
+        """Replay the writes other processes committed since the cached user's version
+
+        Returns False, leaving the user for a full reload, if change_log no
+        longer holds an unbroken chain of commits from that version.
+        """
+        version = self._versions.get(email)
+        rows = self.connection.execute(SELECT_CHANGES, (email, version)).fetchall()
+        if not rows:
+            return False
+        for row in rows:
+            if row['previous'] != version:
+                return False
+            version = row['version']
+        self._local.replaying = True
+        try:
+            for row in rows:
+                for record in pickle.loads(row['ops']):
+                    op, args = pickle.loads(record)
+                    self._replay(op, email, args)
+        except Exception as e:
+            logger.warning("Replaying changes to %s failed, reloading: %s", email, e)
+            return False
+        finally:
+            self._local.replaying = False
+        self._versions[email] = version
+        return True
+
+    def version(self, email):
+        """Stored version of a loaded user as of its last load or commit here"""
+        return self._versions.get(email, 0)
+
+    def latest_version(self):
+        return self.connection.execute(SELECT_LATEST_VERSION).fetchone()[0]
+
+    def poll_changes(self, since):
+        """Return the latest version and the loaded users other processes changed after `since`"""
+        changed = []
+        for row in self.connection.execute(SELECT_CHANGED, (since,)):
+            since = row['version']
+            if row['user_email'] in self.users and self._versions.get(row['user_email']) != row['version']:
+                changed.append(row['user_email'])
+        return since, changed
+
+    def _load_user(self, email):
+        conn = self.connection
+        # Read the version first: data newer than it only causes an extra reload
+        version = self._stored_version(email)
+        row = conn.execute(SELECT_USER, (email,)).fetchone()
+        if row is None:
+            return None
+        self._versions[email] = version
+
+        lines = {}
+        for line in conn.execute(SELECT_ORDER_LINES, (email,)):
+            lines.setdefault(line['order_id'], []).append(line_from_row(line))
+        orders = OrderLog(order_from_row(order, lines.get(order['id'], []))
+                          for order in conn.execute(SELECT_ORDERS, (email,)))
+        next_order_id = conn.execute(SELECT_NEXT_ORDER_ID, (email,)).fetchone()
+        if next_order_id is not None:
+            orders._next_id = max(orders.next_id(), next_order_id[0])
+
+        return {
+            'username': row['username'],
+            'password': row['password'],
+            'inventory': InventoryStore(item_from_row(item) for item in conn.execute(SELECT_INVENTORY, (email,))),
+            'inventory_name': row['inventory_name'],
+            'company_name': row['company_name'],
+            'orders': orders,
+            'sales': SalesAggregates(orders),
+            'history': HistoryLog((history_from_row(entry) for entry in
+                                   conn.execute(SELECT_RECENT_HISTORY, (email, HISTORY_CAPACITY))),
+                                  self._history_archive(email), total=conn.execute(COUNT_HISTORY, (email,)).fetchone()[0]),
+            'categories': [category['name'] for category in conn.execute(SELECT_CATEGORIES, (email,))],
+            'stocks': [dict(stock) for stock in conn.execute(SELECT_STOCKS, (email,))]
+        }
+
+    def _history_archive(self, email):
+        return SQLiteHistoryArchive(self, email)
+
+    def _record(self, op, email, *args):
+        if getattr(self._local, 'replaying', False):
+            return
+        getattr(self, '_write_' + op)(email, *args)
+        self._dirty().add(email)
+        if self.shared:
+            # Pickled now, as later writes in the same request may change the objects
+            self._pending().setdefault(email, []).append(
+                pickle.dumps((op, self._reference_args(op, args)), protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _write_create_user(self, email, username, password):
+        user_data = self.users[email]
+        self.connection.execute(INSERT_USER, (email, username, password,
+                                              user_data['inventory_name'], user_data['company_name']))
+
+    def _write_update_settings(self, email, fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self.connection.execute(UPDATE_USER.format(assignments), tuple(fields.values()) + (email,))
+
+    def _write_add_item(self, email, item):
+        self.connection.execute(INSERT_ITEM, item_to_row(email, item))
+
+    def _write_add_items(self, email, items):
+        self.connection.executemany(INSERT_ITEM, [item_to_row(email, item) for item in items])
+
+    def _write_update_item(self, email, item):
+        self.connection.execute(UPDATE_ITEM, (item['name'], item.get('category'), item['quantity'],
+                                              item['price'], item.get('expiry_date'), email, item['id']))
+
+    def _write_adjust_stock(self, email, item, delta):
+        self.connection.execute(UPDATE_ITEM_QUANTITY, (item['quantity'], email, item['id']))
+
+    def _write_delete_item(self, email, item_id):
+        self.connection.execute(DELETE_ITEM, (email, item_id))
+
+    def _write_add_category(self, email, category):
+        self.connection.execute(INSERT_CATEGORY, (email, category))
+
+    def _write_add_stock(self, email, stock):
+        self.connection.execute(INSERT_STOCK, (email, stock['symbol'], stock['quantity']))
+
+    def _write_add_order(self, email, order):
+        self.connection.execute(INSERT_ORDER, order_to_row(email, order))
+        self.connection.executemany(INSERT_ORDER_LINE, order_lines_to_rows(email, order))
+
+    def _write_add_orders(self, email, orders):
+        self.connection.executemany(INSERT_ORDER, [order_to_row(email, order) for order in orders])
+        self.connection.executemany(INSERT_ORDER_LINE, [row for order in orders
+                                                        for row in order_lines_to_rows(email, order)])
+
+    def _write_delete_order(self, email, order):
+        self.connection.execute(DELETE_ORDER_LINES, (email, order['id']))
+        self.connection.execute(DELETE_ORDER, (email, order['id']))
+        # Ids are otherwise derived from the highest stored one, which a delete can lower
+        self.connection.execute(SAVE_NEXT_ORDER_ID, (email, self.users[email]['orders'].next_id()))
+
+    def _write_replace_order(self, email, old_order, new_order):
+        self._write_delete_order(email, old_order)
+        self._write_add_order(email, new_order)
+
+    def _write_add_history(self, email, entry):
+        self.connection.execute(INSERT_HISTORY, history_to_row(email, entry))
+
+    def _write_add_history_entries(self, email, entries):
+        self.connection.executemany(INSERT_HISTORY, [history_to_row(email, entry) for entry in entries])
+
+
+class SQLiteHistoryArchive:
+    """Older history of one user read back from the history table, which already stores every entry
+
+    An entry's seq is stored with its row, so both directions page by key
+    from the last seq read rather than by OFFSET.
+    """
+
+    CHUNK = 500  # Rows read per query
+
+    def __init__(self, repo, email):
+        self.repo = repo
+        self.email = email
+
+    def append(self, seq, entry):
+        pass  # Written to the table when it was added
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+    def before(self, end, action=None):
+        """Yield (seq, entry) for entries numbered below `end`, newest first"""
+        while True:
+            rows = self.repo.connection.execute(SELECT_HISTORY_BEFORE, (self.email, end, self.CHUNK)).fetchall()
+            for row in rows:
+                entry = history_from_row(row)
+                if action is None or entry.get('action') == action:
+                    yield row['seq'], entry
+            if len(rows) < self.CHUNK:
+                return
+            end = rows[-1]['seq']
+
+    def entries(self, end=None):
+        """Yield entries numbered below `end`, oldest first"""
+        start = 0
+        while True:
+            rows = self.repo.connection.execute(SELECT_HISTORY_FROM, (self.email, start, self.CHUNK)).fetchall()
+            for row in rows:
+                if end is not None and row['seq'] >= end:
+                    return
+                yield history_from_row(row)
+            if len(rows) < self.CHUNK:
+                return
+            start = rows[-1]['seq'] + 1
+
+
+RECORD_HEADER = struct.Struct('<II')  # payload length, crc32
+
+
+class JournalRepository(Repository):
+    """Repository persisted as an append-only journal plus periodic snapshots
+
+    Every write is appended to the current journal segment as a
+    length-prefixed, checksummed pickle of (seq, op, email, args). Records
+    are buffered and written with one fsync per commit(). A thread whose
+    records were already covered by another thread's fsync returns
+    without syncing again (group commit).
+
+    A background thread periodically writes a binary snapshot of all users
+    along with the last journal sequence it includes, and then deletes the
+    journal segments that snapshot covers. Startup loads the newest
+    snapshot and replays only the records after it, so restart time is
+    bounded by the snapshot size plus the tail, not the full history.
+    """
+
+    def __init__(self, directory, snapshot_interval=300, snapshot_min_records=1000):
+        super().__init__()
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_min_records = snapshot_min_records
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._local = threading.local()
+        self._buffer = []
+        self._seq = 0
+        self._durable_seq = 0
+        self._snapshot_seq = 0
+        self._replaying = False
+        self._closed = threading.Event()
+        self._archives = {}
+
+        self._load()
+        self._file = open(self._segment_path(self._seq + 1), 'ab')
+        self._snapshotter = threading.Thread(target=self._snapshot_loop, name='journal-snapshot', daemon=True)
+        self._snapshotter.start()
+
+    def _segment_path(self, first_seq):
+        return os.path.join(self.directory, f"journal-{first_seq:012d}.log")
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, "journal-*.log")))
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, "snapshot.bin")
+
+    def _mutation(self):
+        return self._lock
+
+    def _history_archive(self, email):
+        archive = self._archives.get(email)
+        if archive is None:
+            name = hashlib.sha1(email.encode('utf-8')).hexdigest()
+            archive = self._archives[email] = HistoryArchive(os.path.join(self.directory, 'history', name))
+        return archive
+
+    # Writing
+
+    def _record(self, op, email, *args):
+        if self._replaying:
+            return
+        args = self._reference_args(op, args)
+        self._seq += 1
+        payload = pickle.dumps((self._seq, op, email, args), protocol=pickle.HIGHEST_PROTOCOL)
+        self._buffer.append(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._local.seq = self._seq
+
+    def commit(self):
+        """Make this thread's records durable, sharing fsyncs between concurrent callers"""
+        target = getattr(self._local, 'seq', 0)
+        if target <= self._durable_seq:
+            return
+        with self._sync_lock:
+            if target <= self._durable_seq:
+                return  # Another thread's fsync already covered these records
+            with self._lock:
+                data = b"".join(self._buffer)
+                self._buffer.clear()
+                seq = self._seq
+            self._write(data, seq)
+
+    def _write(self, data, seq):
+        # Callers hold _sync_lock
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._durable_seq = seq
+
+    def rollback(self):
+        # The in-memory model has already changed, so keep the records
+        self.commit()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._local.seq = self._seq
+        self.commit()
+        self.snapshot()
+        self._file.close()
+        for archive in self._archives.values():
+            archive.close()
+
+    # Snapshots
+
+    def _snapshot_loop(self):
+        while not self._closed.wait(self.snapshot_interval):
+            if self._seq - self._snapshot_seq >= self.snapshot_min_records:
+                try:
+                    self.snapshot()
+                except Exception as e:
+                    logger.error("Journal snapshot failed: %s", e)
+
+    def snapshot(self):
+        """Write a snapshot of all users and drop the journal segments it covers"""
+        with self._sync_lock, self._lock:
+            data = pickle.dumps({'seq': self._seq, 'users': {email: self._dump_user(user_data)
+                                                             for email, user_data in self.users.items()}},
+                                protocol=pickle.HIGHEST_PROTOCOL)
+            seq = self._seq
+            # Flush what is pending, then send later records to a fresh segment
+            self._write(b"".join(self._buffer), seq)
+            self._buffer.clear()
+            old_file, self._file = self._file, open(self._segment_path(seq + 1), 'ab')
+        old_file.close()
+
+        # History the snapshot leaves out must be durable before the journal holding it is dropped
+        for archive in list(self._archives.values()):
+            archive.sync()
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._snapshot_seq = seq
+
+        current = self._segment_path(seq + 1)
+        for path in self._segments():
+            if path < current:
+                os.remove(path)
+
+    @staticmethod
+    def _dump_user(user_data):
+        return {
+            'username': user_data['username'],
+            'password': user_data.get('password'),
+            'inventory': list(user_data['inventory']),
+            'next_item_id': user_data['inventory'].next_id(),
+            'inventory_name': user_data['inventory_name'],
+            'company_name': user_data['company_name'],
+            'orders': list(user_data['orders']),
+            'next_order_id': user_data['orders'].next_id(),
+            'history': user_data['history'].recent(),
+            'history_total': len(user_data['history']),
+            'categories': user_data['categories'],
+            'stocks': user_data['stocks']
+        }
+
+    def _restore_user(self, email, data):
+        inventory = InventoryStore(data['inventory'])
+        inventory._next_id = max(inventory.next_id(), data['next_item_id'])
+        orders = OrderLog(data['orders'])
+        orders._next_id = max(orders.next_id(), data.get('next_order_id', 1))
+        return {
+            'username': data['username'],
+            'password': data['password'],
+            'inventory': inventory,
+            'inventory_name': data['inventory_name'],
+            'company_name': data['company_name'],
+            'orders': orders,
+            'sales': SalesAggregates(orders),
+            'history': HistoryLog(data['history'], self._history_archive(email), total=data.get('history_total')),
+            'categories': list(data['categories']),
+            'stocks': list(data['stocks'])
+        }
+
+    # Recovery
+
+    def _load(self):
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as f:
+                snapshot = pickle.load(f)
+            self._seq = self._snapshot_seq = snapshot['seq']
+            for email, data in snapshot['users'].items():
+                self.users[email] = self._restore_user(email, data)
+
+        self._replaying = True
+        try:
+            for path in self._segments():
+                for seq, op, email, args in self._read_segment(path):
+                    if seq > self._seq:
+                        self._replay(op, email, args)
+                        self._seq = seq
+        finally:
+            self._replaying = False
+        self._durable_seq = self._seq
+
+    def _read_segment(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            length, crc = RECORD_HEADER.unpack_from(data, offset)
+            payload = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            yield pickle.loads(payload)
+            offset += RECORD_HEADER.size + length
+        if offset < len(data):
+            # A torn write from a crash: drop the incomplete tail
+            logger.warning("Truncating %d bytes of incomplete journal in %s", len(data) - offset, path)
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
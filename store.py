@@ -0,0 +1,541 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from contextlib import nullcontext
+import heapq
+import threading
+from datetime import datetime, time, timedelta
+
+from columns import OrderLines
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+HISTORY_CAPACITY = 1000  # History entries per user kept in memory when older ones are archived
+
+
+def parse_order_date(value):
+    """Return an order date as a datetime, migrating legacy string dates"""
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def format_order_date(value, fmt=DATE_FORMAT):
+    return parse_order_date(value).strftime(fmt)
+
+
+def serialize_order(order):
+    """Return a JSON-safe copy of an order with its date formatted"""
+    data = dict(order)
+    data['date'] = format_order_date(order['date'])
+    return data
+
+
+class RankedTotals:
+    """Quantity and value totals per key, kept ranked by value as they change
+
+    ranked() holds `lock`, if given, which writers hold around add().
+    """
+
+    def __init__(self, lock=None):
+        self._totals = {}
+        self._ranking = []
+        self._lock = lock if lock is not None else nullcontext()
+
+    def add(self, key, quantity, value, rows=0, rank=True):
+        """Apply a delta to a key's totals; the key is dropped when its row count reaches zero
+
+        With rank=False the ranking is left stale and rebuilt by the next
+        ranked() call, which is cheaper for bulk loads.
+        """
+        if not rank:
+            self._ranking = None
+        entry = self._totals.get(key)
+        if entry is None:
+            entry = self._totals[key] = [0.0, 0.0, 0]
+        elif self._ranking is not None:
+            del self._ranking[bisect_left(self._ranking, (-entry[1], key))]
+        entry[0] += quantity
+        entry[1] += value
+        entry[2] += rows
+        if entry[2] <= 0:
+            del self._totals[key]
+        elif self._ranking is not None:
+            insort(self._ranking, (-entry[1], key))
+
+    def __len__(self):
+        return len(self._totals)
+
+    def ranked(self, count=None):
+        """Return (key, quantity, value) tuples by value, highest first"""
+        with self._lock:
+            if self._ranking is None:
+                self._ranking = sorted((-entry[1], key) for key, entry in self._totals.items())
+            # Only copy under the lock; the rows are built outside it so writers are not held up
+            ranking = self._ranking[:count]
+            totals = dict(self._totals)
+        return [(key, totals[key][0], totals[key][1]) for _, key in ranking]
+
+
+class DailyTrend:
+    """Running least-squares sums over daily revenue, for a line fit without revisiting orders
+
+    Each day with orders is one point: x is its offset in days from the
+    first day seen (kept as exact integers), y its revenue. A change to a
+    day's revenue removes the old point and adds the new one.
+    """
+
+    MIN_DAYS = 5  # Days with sales needed before a line is fitted
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.origin = None
+        self.days = 0
+        self.sum_x = 0
+        self.sum_xx = 0
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+        self.sum_yy = 0.0
+
+    def _apply(self, day, revenue, sign):
+        if self.origin is None:
+            self.origin = day.toordinal()
+        x = day.toordinal() - self.origin
+        self.days += sign
+        self.sum_x += sign * x
+        self.sum_xx += sign * x * x
+        self.sum_y += sign * revenue
+        self.sum_xy += sign * x * revenue
+        self.sum_yy += sign * revenue * revenue
+        if not self.days:
+            self._reset()
+
+    def add(self, day, revenue):
+        self._apply(day, revenue, 1)
+
+    def remove(self, day, revenue):
+        self._apply(day, revenue, -1)
+
+    def fit(self):
+        """Return (origin ordinal, slope, intercept, R²) of the fitted line, or None with too few days"""
+        n = self.days
+        if n < self.MIN_DAYS:
+            return None
+        sxx = (n * self.sum_xx - self.sum_x * self.sum_x) / n
+        sxy = self.sum_xy - self.sum_x * self.sum_y / n
+        syy = self.sum_yy - self.sum_y * self.sum_y / n
+        slope = sxy / sxx
+        intercept = (self.sum_y - slope * self.sum_x) / n
+        # R² of a least-squares line with intercept; a flat series is fitted exactly
+        r2 = sxy * sxy / (sxx * syy) if syy > 1e-9 * max(self.sum_yy, 1) else 1.0
+        return self.origin, slope, intercept, r2
+
+
+class InventoryValuation:
+    """Per-category and per-item quantity and value totals of an inventory"""
+
+    def __init__(self, lock=None):
+        self.categories = RankedTotals(lock)
+        self.items = RankedTotals(lock)
+
+    def _add(self, item, quantity, rows, rank=True):
+        value = float(item.get('price', 0)) * quantity
+        self.categories.add(item.get('category') or 'Uncategorized', quantity, value, rows, rank)
+        self.items.add(item.get('name') or 'Unknown', quantity, value, rows, rank)
+
+    def record(self, item, rank=True):
+        self._add(item, float(item.get('quantity', 0)), 1, rank)
+
+    def retract(self, item):
+        self._add(item, -float(item.get('quantity', 0)), -1)
+
+    def adjust(self, item, delta):
+        """Apply a quantity change to an item that stays in the inventory"""
+        self._add(item, float(delta), 0)
+
+
+class InventoryStore:
+    """Per-user inventory keyed by id, with name and (name, category, price) indexes
+
+    Writes hold a lock that reads walking the items share: iteration goes
+    over a copy taken under it, so a request reading the inventory never
+    sees it change size part-way through another request's write.
+    """
+
+    def __init__(self, items=None):
+        self._lock = threading.RLock()
+        self._items = {}
+        self._by_name = {}
+        self._by_key = {}
+        self._ids = []  # Sorted, for paging by id
+        self._next_id = 1
+        self.valuation = InventoryValuation(self._lock)
+        self.add_many(items or [])
+
+    @staticmethod
+    def match_key(name, category, price):
+        """Key under which find_matching() treats items as the same product"""
+        return (name.lower(), (category or '').lower(), price)
+
+    def _index(self, item):
+        self._by_name.setdefault(item['name'], []).append(item['id'])
+        # Edits can give several items the same key, so keep all of them
+        self._by_key.setdefault(self.match_key(item['name'], item.get('category'), item['price']), []).append(item['id'])
+
+    def _unindex(self, item):
+        for index, key in ((self._by_name, item['name']),
+                           (self._by_key, self.match_key(item['name'], item.get('category'), item['price']))):
+            ids = index.get(key, [])
+            if item['id'] in ids:
+                ids.remove(item['id'])
+            if not ids:
+                index.pop(key, None)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def next_id(self):
+        """Return the id the next new item will receive"""
+        return self._next_id
+
+    def add(self, item, rank=True):
+        """Insert a new item, assigning an id if it has none"""
+        with self._lock:
+            if item.get('id') is None:
+                item['id'] = self._next_id
+            self._items[item['id']] = item
+            if not self._ids or item['id'] > self._ids[-1]:
+                self._ids.append(item['id'])
+            else:
+                insort(self._ids, item['id'])
+            self._next_id = max(self._next_id, item['id'] + 1)
+            self._index(item)
+            self.valuation.record(item, rank)
+        return item
+
+    def add_many(self, items):
+        """Insert new items, re-ranking the valuation once on next read instead of per item"""
+        with self._lock:
+            for item in items:
+                self.add(item, rank=False)
+        return items
+
+    def get(self, item_id):
+        return self._items.get(item_id)
+
+    def page(self, after=None, count=50, match=None):
+        """Return up to `count` items with ids above `after` in id order, keeping only those match() accepts"""
+        with self._lock:
+            position = bisect_right(self._ids, after) if after is not None else 0
+            rows = []
+            while position < len(self._ids) and len(rows) < count:
+                item = self._items[self._ids[position]]
+                if match is None or match(item):
+                    rows.append(item)
+                position += 1
+            return rows
+
+    def find_by_name(self, name):
+        """Return the first item with this exact name"""
+        with self._lock:
+            ids = self._by_name.get(name)
+            return self._items[ids[0]] if ids else None
+
+    def find_matching(self, name, category, price):
+        """Return the first item matching name and category case-insensitively at this price"""
+        with self._lock:
+            ids = self._by_key.get(self.match_key(name, category, price))
+            return self._items[ids[0]] if ids else None
+
+    def update(self, item_id, **fields):
+        """Update fields of an item, keeping the indexes in sync"""
+        with self._lock:
+            item = self._items.get(item_id)
+            if item is None:
+                return None
+            self._unindex(item)
+            self.valuation.retract(item)
+            item.update(fields)
+            self._index(item)
+            self.valuation.record(item)
+        return item
+
+    def adjust_quantity(self, item, delta):
+        """Change an item's stock level by delta"""
+        with self._lock:
+            item['quantity'] += delta
+            self.valuation.adjust(item, delta)
+        return item
+
+    def remove(self, item_id):
+        with self._lock:
+            item = self._items.pop(item_id, None)
+            if item is not None:
+                del self._ids[bisect_left(self._ids, item_id)]
+                self._unindex(item)
+                self.valuation.retract(item)
+        return item
+
+
+class OrderLog:
+    """Per-user orders kept sorted by date, supporting bisect range queries"""
+
+    def __init__(self, orders=None):
+        self._orders = []
+        self._dates = []
+        self._by_id = {}
+        self._next_id = 1
+        for order in orders or []:
+            self.add(order)
+
+    def __iter__(self):
+        return iter(self._orders)
+
+    def __reversed__(self):
+        return reversed(self._orders)
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __bool__(self):
+        return bool(self._orders)
+
+    def __getitem__(self, index):
+        return self._orders[index]
+
+    def add(self, order):
+        """Insert an order at its chronological position"""
+        order['date'] = parse_order_date(order['date'])
+        position = bisect_right(self._dates, order['date'])
+        # Orders placed in the same second stay in id order, so (date, id) is a strict sort key
+        while (position and self._dates[position - 1] == order['date']
+               and (self._orders[position - 1].get('id') or 0) > (order.get('id') or 0)):
+            position -= 1
+        self._dates.insert(position, order['date'])
+        self._orders.insert(position, order)
+        if order.get('id') is not None:
+            self._by_id[order['id']] = order
+            self._next_id = max(self._next_id, order['id'] + 1)
+        return order
+
+    def next_id(self):
+        """Return the id the next new order should receive"""
+        return self._next_id
+
+    def get(self, order_id):
+        return self._by_id.get(order_id)
+
+    def _position(self, order):
+        position = bisect_left(self._dates, order['date'])
+        while position < len(self._orders) and self._dates[position] == order['date']:
+            if self._orders[position] is order:
+                return position
+            position += 1
+        raise ValueError('order not in log')
+
+    def remove(self, order):
+        position = self._position(order)
+        del self._dates[position]
+        del self._orders[position]
+        if self._by_id.get(order.get('id')) is order:
+            del self._by_id[order['id']]
+        return order
+
+    def replace(self, old_order, new_order):
+        self.remove(old_order)
+        return self.add(new_order)
+
+    def newest(self, count=None):
+        """Return orders newest first, optionally only the most recent `count`"""
+        if count is None:
+            return self._orders[::-1]
+        return self._orders[:-count - 1:-1] if count > 0 else []
+
+    def page(self, before=None, count=50, match=None):
+        """Return up to `count` orders older than a (date, id) cursor, newest first, keeping only those match() accepts"""
+        position = len(self._orders)
+        if before is not None:
+            date, order_id = before
+            position = bisect_left(self._dates, date)
+            while (position < len(self._orders) and self._dates[position] == date
+                   and (self._orders[position].get('id') or 0) < order_id):
+                position += 1
+        rows = []
+        while position and len(rows) < count:
+            position -= 1
+            order = self._orders[position]
+            if match is None or match(order):
+                rows.append(order)
+        return rows
+
+    def between(self, start=None, end=None):
+        """Return orders with start <= date < end, oldest first"""
+        lo = bisect_left(self._dates, start) if start is not None else 0
+        hi = bisect_left(self._dates, end) if end is not None else len(self._dates)
+        return self._orders[lo:hi]
+
+    def on_date(self, day):
+        """Return the orders placed on a calendar day, oldest first"""
+        start = datetime.combine(day, time.min)
+        return self.between(start, start + timedelta(days=1))
+
+
+class HistoryLog:
+    """Per-user history with the newest entries in memory and older ones in an archive
+
+    Entries are numbered from 0 in the order they are added. With an
+    archive, the newest `capacity` stay in a ring buffer and the oldest is
+    passed to archive.append(seq, entry) as it falls out; without one,
+    every entry stays in memory. `total` restores the numbering when only
+    the newest entries are loaded.
+    """
+
+    def __init__(self, entries=None, archive=None, capacity=HISTORY_CAPACITY, total=None):
+        entries = list(entries or [])
+        self.archive = archive
+        self._recent = deque(maxlen=capacity if archive is not None else None)  # (seq, entry)
+        self._total = len(entries) if total is None else total
+        self._total -= len(entries)
+        self.extend(entries)
+
+    def __len__(self):
+        return self._total
+
+    def __iter__(self):
+        """Yield every entry oldest first, reading archived ones from disk"""
+        recent = list(self._recent)
+        if self.archive is not None:
+            yield from self.archive.entries(recent[0][0] if recent else self._total)
+        for _, entry in recent:
+            yield entry
+
+    def append(self, entry):
+        if self._recent.maxlen is not None and len(self._recent) == self._recent.maxlen:
+            self.archive.append(*self._recent[0])
+        self._recent.append((self._total, entry))
+        self._total += 1
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def recent(self):
+        """Return the entries held in memory, oldest first"""
+        return [entry for _, entry in self._recent]
+
+    def page(self, before=None, count=50, action=None):
+        """Return up to `count` (seq, entry) pairs numbered below `before`, newest first, optionally of one action"""
+        recent = list(self._recent)
+        end = self._total if before is None else before
+        rows = []
+        for seq, entry in reversed(recent):
+            if seq < end and (action is None or entry.get('action') == action):
+                rows.append((seq, entry))
+                if len(rows) == count:
+                    return rows
+        if self.archive is not None:
+            for row in self.archive.before(min(end, recent[0][0]) if recent else end, action):
+                rows.append(row)
+                if len(rows) == count:
+                    break
+        return rows
+
+
+class SalesAggregates:
+    """Running sales totals per user, updated as orders are added, edited and deleted"""
+
+    def __init__(self, orders=None):
+        self.total_revenue = 0
+        self.order_count = 0
+        self.products = {}
+        self.daily = {}
+        self.daily_products = {}
+        self.hourly = {}
+        self.trend = DailyTrend()  # Regression sums over self.daily's revenue
+        self.lines = OrderLines()  # Columnar copy of every order line for range analytics
+        for order in orders or []:
+            self.record(order)
+
+    def _apply(self, order, sign):
+        day = order['date'].date()
+        hour = order['date'].hour
+        total = order.get('total', 0)
+        quantity = sum(item.get('quantity', 0) for item in order.get('items', []))
+
+        self.total_revenue += sign * total
+        self.order_count += sign
+
+        if day in self.daily:
+            self.trend.remove(day, self.daily[day]['revenue'])
+        daily = self.daily.setdefault(day, {'revenue': 0, 'quantity': 0, 'orders': 0})
+        daily['revenue'] += sign * total
+        daily['quantity'] += sign * quantity
+        daily['orders'] += sign
+
+        hourly = self.hourly.setdefault((day, hour), {'revenue': 0, 'quantity': 0, 'orders': 0})
+        hourly['revenue'] += sign * total
+        hourly['quantity'] += sign * quantity
+        hourly['orders'] += sign
+
+        day_products = self.daily_products.setdefault(day, {})
+        for item in order.get('items', []):
+            name = item.get('name', 'Unknown')
+            item_quantity = item.get('quantity', 0)
+            revenue = item.get('price', 0) * item_quantity
+
+            product = self.products.setdefault(name, {'name': name, 'quantity': 0, 'revenue': 0, 'lines': 0})
+            product['quantity'] += sign * item_quantity
+            product['revenue'] += sign * revenue
+            product['lines'] += sign
+            if not product['lines']:
+                del self.products[name]
+
+            day_product = day_products.setdefault(name, {'revenue': 0, 'lines': 0})
+            day_product['revenue'] += sign * revenue
+            day_product['lines'] += sign
+            if not day_product['lines']:
+                del day_products[name]
+
+        # Drop emptied buckets so they don't accumulate rounding residue
+        if not daily['orders']:
+            del self.daily[day]
+        else:
+            self.trend.add(day, daily['revenue'])
+        if not hourly['orders']:
+            del self.hourly[(day, hour)]
+        if not day_products:
+            del self.daily_products[day]
+        if not self.order_count:
+            self.total_revenue = 0
+
+    def record(self, order):
+        """Add an order's totals"""
+        self._apply(order, 1)
+        self.lines.append(order)
+
+    def retract(self, order):
+        """Remove the totals of an order that was deleted or is being replaced"""
+        self._apply(order, -1)
+        self.lines.remove(order)
+
+    def top_products(self, count=None):
+        """Return product totals sorted by revenue, highest first"""
+        if count is None:
+            return sorted(self.products.values(), key=lambda x: x['revenue'], reverse=True)
+        return heapq.nlargest(count, self.products.values(), key=lambda x: x['revenue'])
+
+    def hourly_sales(self, day):
+        """Return 24 hourly buckets of revenue and quantity for a day"""
+        empty = {'revenue': 0, 'quantity': 0, 'orders': 0}
+        return [self.hourly.get((day, hour), empty) for hour in range(24)]
+
+    def product_sales_on(self, day):
+        """Return product revenue for a day, in first-sold order"""
+        return {name: data['revenue'] for name, data in self.daily_products.get(day, {}).items()}